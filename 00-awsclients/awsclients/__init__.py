@@ -0,0 +1,3 @@
+"""Shared boto3 sessions and clients for webotron, notifon and videolyzer."""
+
+from awsclients.factory import Session, session, reset
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for shared boto3 clients tuned for concurrent use."""
+
+import os
+import threading
+from pathlib import Path
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import JSONFileCache
+
+DEFAULT_CONCURRENCY = 10
+RETRIES = {
+    'mode': 'adaptive',
+    'max_attempts': 10
+}
+
+
+def credential_cache_dir():
+    """Get directory of cached assumed role credentials.
+
+    Same as the AWS CLI, so credentials are shared with it.
+    """
+    return os.environ.get('AWSCLIENTS_CREDENTIAL_CACHE') or \
+        str(Path.home() / '.aws' / 'cli' / 'cache')
+
+
+class Session:
+    """boto3 session handing out cached, tuned clients and resources.
+
+    Clients are cached per service, region and endpoint, and recreated
+    with a bigger connection pool when a caller declares more
+    concurrency than the cached one was created for.
+    """
+
+    def __init__(self, profile_name=None, region_name=None, config=None):
+        """Create Session, config is merged into every client config."""
+        core = botocore.session.Session(profile=profile_name)
+        provider = core.get_component('credential_provider') \
+            .get_provider('assume-role')
+        provider.cache = JSONFileCache(credential_cache_dir())
+        self.session = boto3.Session(botocore_session=core,
+                                     region_name=region_name)
+        self.config = config
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    @property
+    def profile_name(self):
+        """Get profile name of the session."""
+        return self.session.profile_name
+
+    @property
+    def region_name(self):
+        """Get default region of the session."""
+        return self.session.region_name
+
+    def create(self, kind, service_name, region_name=None,
+               concurrency=None, endpoint_url=None):
+        """Create a new client or resource."""
+        config = Config(
+            retries=RETRIES,
+            max_pool_connections=max(concurrency or 0, DEFAULT_CONCURRENCY)
+        )
+        if self.config:
+            config = config.merge(self.config)
+        factory = self.session.client if kind == 'client' \
+            else self.session.resource
+        return factory(
+            service_name,
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=config
+        )
+
+    def get(self, kind, service_name, region_name=None, concurrency=None,
+            endpoint_url=None):
+        """Get cached client or resource, create it when needed."""
+        key = (kind, service_name, region_name or self.region_name,
+               endpoint_url)
+        pool = max(concurrency or 0, DEFAULT_CONCURRENCY)
+        # creating clients from one session is not thread safe
+        with self.lock:
+            cached = self.clients.get(key)
+            if cached is None or cached[0] < pool:
+                cached = (pool, self.create(kind, service_name, region_name,
+                                            concurrency, endpoint_url))
+                self.clients[key] = cached
+        return cached[1]
+
+    def client(self, service_name, region_name=None, concurrency=None,
+               endpoint_url=None):
+        """Get shared client of a service."""
+        return self.get('client', service_name, region_name, concurrency,
+                        endpoint_url)
+
+    def resource(self, service_name, region_name=None, concurrency=None,
+                 endpoint_url=None):
+        """Get shared resource of a service."""
+        return self.get('resource', service_name, region_name, concurrency,
+                        endpoint_url)
+
+    def reset(self):
+        """Forget all clients, next use creates new ones."""
+        with self.lock:
+            self.clients.clear()
+
+
+_SESSIONS = {}
+_LOCK = threading.Lock()
+
+
+def session(profile_name=None, region_name=None):
+    """Get shared Session of a profile and region."""
+    key = (profile_name, region_name)
+    with _LOCK:
+        if key not in _SESSIONS:
+            _SESSIONS[key] = Session(profile_name, region_name)
+        return _SESSIONS[key]
+
+
+def reset():
+    """Forget all shared sessions."""
+    with _LOCK:
+        _SESSIONS.clear()
@@ -0,0 +1,15 @@
+from setuptools import setup
+
+setup(
+    name='awsclients',
+    version='0.1',
+    author='Marek Korpacz',
+    author_email='korobass@o2.pl',
+    description='Shared boto3 sessions and clients tuned for concurrent use',
+    license='GPLv3+',
+    packages=['awsclients'],
+    url='https://github.com/korobass/myPython',
+    install_requires=[
+        'boto3'
+    ]
+)
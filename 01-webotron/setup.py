@@ -10,9 +10,14 @@ setup(
     packages=['webotron'],
     url='https://github.com/korobass/myPython',
     install_requires=[
+        'awsclients',
         'boto3',
         'click'
     ],
+    extras_require={
+        'inventory': ['pyarrow'],
+        'optimize': ['minify-html', 'rcssmin', 'rjsmin', 'Pillow']
+    },
     entry_points='''
         [console_scripts]
         webotron=webotron.webotron:cli
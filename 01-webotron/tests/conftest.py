@@ -0,0 +1,45 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Shared fixtures of webotron tests."""
+
+import boto3
+import pytest
+
+from webotron import util
+
+
+class FakeSession:
+    """Session with dummy credentials, handing out plain boto3 resources."""
+
+    region_name = 'us-east-1'
+
+    @staticmethod
+    def client(*args, **kwargs):
+        """Fail, tests create clients through resources."""
+        raise AssertionError("unexpected client {} {}".format(args, kwargs))
+
+    @staticmethod
+    def resource(service_name, region_name=None, concurrency=None):
+        """Create resource with dummy credentials."""
+        del concurrency
+        return boto3.session.Session(
+            aws_access_key_id='testing',
+            aws_secret_access_key='testing',
+            region_name=region_name or 'us-east-1'
+        ).resource(service_name)
+
+
+@pytest.fixture(name='session')
+def fixture_session():
+    """Session without AWS access."""
+    return FakeSession()
+
+
+@pytest.fixture(name='cache_dir', autouse=True)
+def fixture_cache_dir(tmp_path, monkeypatch):
+    """Keep webotron caches in a temporary directory."""
+    path = tmp_path / 'cache'
+    path.mkdir()
+    monkeypatch.setattr(util, 'cache_dir', lambda: path)
+    return path
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Tests for SHA-256 checksums cached by listed ETag."""
+
+import base64
+from hashlib import sha256
+
+import pytest
+
+from webotron.checksum import ChecksumIndex
+from webotron.manifest import Manifest
+
+DIGEST = sha256(b'kitten').hexdigest()
+
+
+class FakeClient:
+    """S3 client answering head_object, counting the requests."""
+
+    def __init__(self, etags):
+        """Create a FakeClient with {key: etag} objects."""
+        self.etags = etags
+        self.heads = []
+
+    def head_object(self, Bucket, Key, ChecksumMode):
+        """Return ETag and additional checksum of an object."""
+        del Bucket, ChecksumMode
+        self.heads.append(Key)
+        return {
+            'ETag': self.etags[Key],
+            'ChecksumSHA256': base64.b64encode(
+                bytes.fromhex(DIGEST)).decode('ascii')
+        }
+
+
+@pytest.fixture(name='site')
+def fixture_site(tmp_path):
+    """Local directory with one file."""
+    root = tmp_path / 'site'
+    root.mkdir()
+    (root / 'index.html').write_bytes(b'kitten')
+    return root
+
+
+def load(root, client, etag):
+    """Load checksums of the local file into a fresh manifest."""
+    manifest = Manifest()
+    manifest.add('index.html', etag, 6)
+    index = ChecksumIndex(client, root)
+    index.load('kitten-web', manifest, [(str(root / 'index.html'),
+                                         'index.html')])
+    index.save()
+    return manifest
+
+
+def test_head_only_objects_with_changed_etag(site):
+    """Second sync reuses cached checksum until the ETag changes."""
+    client = FakeClient({'index.html': '"kms-1"'})
+    assert load(site, client, '"kms-1"')['index.html'] == DIGEST
+    assert load(site, client, '"kms-1"')['index.html'] == DIGEST
+    assert client.heads == ['index.html']
+
+    client.etags['index.html'] = '"kms-2"'
+    assert load(site, client, '"kms-2"')['index.html'] == DIGEST
+    assert client.heads == ['index.html', 'index.html']
+
+
+def test_local_checksum_matches_remote(site):
+    """Local file checksum equals the one S3 reports for it."""
+    index = ChecksumIndex(FakeClient({}), site)
+    assert index.gen_checksum(str(site / 'index.html')) == DIGEST
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Tests for S3 Inventory reports read from a local directory."""
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+import moto
+import pytest
+
+from webotron.bucket import BucketManager
+from webotron.inventory import InventoryReader
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'inventory'
+
+
+def test_reads_manifest_from_directory(session):
+    """Manifest fields are read from the directory."""
+    reader = InventoryReader(session, str(FIXTURE))
+    assert reader.source_bucket == 'kitten-web'
+    assert reader.timestamp == datetime(2020, 9, 13, 12, 26, 40,
+                                        tzinfo=timezone.utc)
+
+
+def test_objects_skip_old_versions_and_delete_markers(session):
+    """Only current objects are listed, with decoded keys, quoted ETags."""
+    reader = InventoryReader(session, str(FIXTURE / 'manifest.json'))
+    assert list(reader.objects()) == [
+        ('index.html', '"d41d8cd98f00b204e9800998ecf8427e"'),
+        ('img/kitten 1.jpg', '"5d41402abc4b2a76b9719d911017c592-2"')
+    ]
+
+
+def test_load_inventory_seeds_manifest(session):
+    """Report of the synced bucket fills manifest and ETag index."""
+    manager = BucketManager(session)
+    manager.load_inventory('kitten-web', str(FIXTURE))
+    assert manager.manifest['index.html'] == \
+        '"d41d8cd98f00b204e9800998ecf8427e"'
+    assert manager.manifest.source('"5d41402abc4b2a76b9719d911017c592-2"') \
+        == 'img/kitten 1.jpg'
+    assert manager.manifest.timestamp == 1600000000
+
+
+def test_load_inventory_rejects_other_bucket(session):
+    """Report of another bucket stops the sync."""
+    manager = BucketManager(session)
+    with pytest.raises(SystemExit) as error:
+        manager.load_inventory('dog-web', str(FIXTURE))
+    assert 'kitten-web' in str(error.value)
+    assert not manager.manifest
+
+
+def test_copy_source_deleted_after_report_falls_back_to_upload(
+        session, tmp_path):
+    """Key listed by the report but gone from the bucket is not copied."""
+    path = tmp_path / 'new.css'
+    path.write_bytes(b'AAA')
+    with moto.mock_aws():
+        manager = BucketManager(session)
+        bucket = manager.s3_res.create_bucket(Bucket='kitten-web')
+        # report taken after the local file was written, before the rename
+        manager.manifest.add('old.css', manager.gen_etag(str(path)))
+        manager.manifest.timestamp = path.stat().st_mtime + 60
+
+        manager.upload_file(bucket, str(path), 'new.css')
+
+        body = manager.s3_res.Object('kitten-web', 'new.css').get()['Body']
+        assert body.read() == b'AAA'
+    assert manager.manifest['old.css'] is None
@@ -0,0 +1,35 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Tests for asset optimization before upload."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from webotron import optimize
+
+
+def test_failing_optimizer_keeps_original(tmp_path, monkeypatch, capsys):
+    """File an optimizer can't handle is uploaded as it is."""
+    monkeypatch.setattr(optimize, 'rcssmin',
+                        SimpleNamespace(cssmin=lambda text: text))
+    path = tmp_path / 'latin1.css'
+    path.write_bytes('body { content: "\xe9"; }'.encode('latin-1'))
+
+    output, webp = optimize.optimize_file(str(path), str(tmp_path), False)
+
+    assert (output, webp) == (str(path), None)
+    assert 'Not optimizing' in capsys.readouterr().out
+
+
+def test_broken_image_gets_no_webp(tmp_path, monkeypatch):
+    """Image Pillow can't read keeps its source and gets no variant."""
+    pytest.importorskip('PIL')
+    monkeypatch.setattr(optimize.shutil, 'which', lambda name: None)
+    path = tmp_path / 'broken.jpg'
+    path.write_bytes(b'not a jpeg')
+
+    output, webp = optimize.optimize_file(str(path), str(tmp_path), True)
+
+    assert (output, webp) == (str(path), None)
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Tests for sync against a moto S3 bucket."""
+
+import moto
+import pytest
+
+from webotron.bucket import BucketManager
+
+BUCKET = 'kitten-web'
+
+
+@pytest.fixture(name='manager')
+def fixture_manager(session):
+    """BucketManager of an empty mocked bucket."""
+    with moto.mock_aws():
+        manager = BucketManager(session)
+        manager.s3_res.create_bucket(Bucket=BUCKET)
+        yield manager
+
+
+def put(manager, files):
+    """Store {key: data} objects in the bucket."""
+    for key, data in files.items():
+        manager.s3_res.Object(BUCKET, key).put(Body=data)
+
+
+def contents(manager):
+    """Get {key: data} of all objects in the bucket."""
+    return {
+        obj.key: obj.get()['Body'].read()
+        for obj in manager.s3_res.Bucket(BUCKET).objects.all()
+    }
+
+
+def write(root, files):
+    """Create local files from {key: data}."""
+    root.mkdir()
+    for key, data in files.items():
+        (root / key).write_bytes(data)
+
+
+def test_sync_swapped_files(manager, tmp_path):
+    """Content moved between two keys ends up in the right keys."""
+    put(manager, {'a.css': b'AAA', 'b.css': b'BBB'})
+    write(tmp_path / 'site', {'a.css': b'BBB', 'b.css': b'AAA'})
+
+    manager.sync(str(tmp_path / 'site'), BUCKET)
+
+    assert contents(manager) == {'a.css': b'BBB', 'b.css': b'AAA'}
+
+
+def test_sync_copies_unchanged_content(manager, tmp_path):
+    """Content already stored under another key is copied."""
+    put(manager, {'a.css': b'AAA'})
+    write(tmp_path / 'site', {'a.css': b'AAA', 'c.css': b'AAA'})
+
+    manager.sync(str(tmp_path / 'site'), BUCKET)
+
+    assert contents(manager) == {'a.css': b'AAA', 'c.css': b'AAA'}
+    assert list(manager.changed_keys) == ['c.css']
+
+
+def test_checksum_sync_uploads_foreign_object_once(session, tmp_path):
+    """Object without checksum is uploaded once, then found unchanged."""
+    write(tmp_path / 'site', {'index.html': b'kitten'})
+    with moto.mock_aws():
+        manager = BucketManager(session)
+        manager.s3_res.create_bucket(Bucket=BUCKET)
+        # written by another tool, no checksum
+        put(manager, {'index.html': b'kitten'})
+        uploads = []
+        for _ in range(3):
+            manager = BucketManager(session)
+            manager.sync(str(tmp_path / 'site'), BUCKET, checksum=True)
+            uploads.append(list(manager.changed_keys))
+
+    assert uploads == [['index.html'], [], []]
@@ -4,29 +4,47 @@
 """Classes for S3 Buckets."""
 
 import mimetypes
+import os
 from pathlib import Path
 import re
 import sys
 from hashlib import md5
 from functools import reduce
-import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
+from webotron.changes import ChangeLog
+from webotron.checksum import ChecksumIndex
+from webotron.inventory import InventoryReader
+from webotron.listing import BucketLister
+from webotron.manifest import Manifest
 
 
 class BucketManager:
     """Manage an S3 Bucket."""
 
     CHUNK_SIZE = 8388608
+    MAX_WORKERS = 8
+    TRANSFER_CONFIG = TransferConfig(
+        multipart_threshold=CHUNK_SIZE,
+        multipart_chunksize=CHUNK_SIZE
+    )
 
-    def __init__(self, session):
+    def __init__(self, session, region_name=None):
         """Create a BucketManager object."""
         self.session = session
-        self.s3_res = self.session.resource('s3')
-        self.transfer_config = boto3.s3.transfer.TransferConfig(
-            multipart_threshold=self.CHUNK_SIZE,
-            multipart_chunksize=self.CHUNK_SIZE
+        # file workers and ranged GET workers run at the same time
+        self.s3_res = self.session.resource(
+            's3',
+            region_name=region_name,
+            concurrency=self.MAX_WORKERS * 2
         )
-        self.manifest = {}
+        self.lister = BucketLister(self.s3_res.meta.client, self.MAX_WORKERS)
+        self.manifest = Manifest()
+        self.synced_keys = set()
+        # keys uploaded or copied by sync, in order, see warm command
+        self.changed_keys = {}
+        # compare SHA-256 checksums instead of ETags, see ChecksumIndex
+        self.checksums = None
 
     def all_buckets(self):
         """Get an iterator for all buckets."""
@@ -54,15 +72,15 @@ class BucketManager:
                '.s3-website.' + self.get_bucket_region_name(bucket.name) + \
                '.amazonaws.com'
 
-    def all_objects(self, bucket_name):
-        """Get all objects of a bucket."""
+    def all_objects(self, bucket_name, prefix=''):
+        """Get an iterator for all objects of a bucket."""
         # exit if bucket doesn't exist
         if not self.check_bucket(bucket_name):
             sys.exit()
         if not self.is_valid_bucket_name(bucket_name):
             sys.exit(self.print_aws_s3_doc())
 
-        return self.s3_res.Bucket(bucket_name).objects.all()
+        return self.lister.objects(bucket_name, prefix)
 
     def init_bucket(self, bucket_name):
         """Create a new bucket, or return existing one by name."""
@@ -115,15 +133,51 @@ class BucketManager:
             }
         )
 
-    def load_manifest(self, bucket_name):
-        """Load manifest for caching purposes.
+    def load_inventory(self, bucket_name, location):
+        """Load manifest from an S3 Inventory report.
 
-        https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Paginator.ListObjectsV2
+        Much faster than listing for big buckets, but only as fresh as the
+        report. Files changed locally after the report are checked again,
+        see reconcile_object, and copy sources deleted since then fall back
+        to upload. Objects changed in the bucket after the report, by
+        another sync or tool, are not seen: a file whose content the
+        report still matches is skipped.
         """
-        paginator = self.s3_res.meta.client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket_name):
-            for obj in page.get('Contents', []):
-                self.manifest[obj['Key']] = obj['ETag']
+        reader = InventoryReader(self.session, location)
+        # a report of another bucket would make sync skip real uploads
+        if reader.source_bucket != bucket_name:
+            sys.exit("Inventory report lists bucket {}, not {}".format(
+                reader.source_bucket, bucket_name))
+        for key, etag in reader.objects():
+            self.manifest.add(key, etag)
+        self.manifest.timestamp = reader.timestamp.timestamp()
+
+    def reconcile_object(self, bucket, path, key):
+        """Refresh manifest entry of a file changed after the inventory.
+
+        Files modified locally after the report was taken may have been
+        synced since then, so ask S3 for their current ETag instead of
+        trusting the report.
+        """
+        if not self.manifest.timestamp or \
+                os.stat(path).st_mtime <= self.manifest.timestamp:
+            return
+        try:
+            head = self.s3_res.meta.client.head_object(
+                Bucket=bucket.name,
+                Key=key,
+                ChecksumMode='ENABLED'
+            )
+            self.manifest.add(
+                key,
+                self.checksums.remote_checksum(key, head)
+                if self.checksums else head['ETag'],
+                head['ContentLength']
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise error
+            self.manifest.forget(key)
 
     @staticmethod
     def hash_data(data):
@@ -164,36 +218,92 @@ class BucketManager:
 
     def delete_missing_objects(self, bucket_name):
         """Delete file that doesn't exist locally on the s3 bucket."""
-        paginator = self.s3_res.meta.client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket_name):
-            for obj in page.get('Contents', []):
-                pathname = Path("kitten_web/" + obj['Key'])
-                if not Path.exists(pathname):
-                    self.manifest[obj['Key']] = None
-                    print("Deleting {}, non existing object"
-                          .format(obj['Key']))
-                    self.s3_res.meta.client.delete_object(
-                        Bucket=bucket_name,
-                        Key=obj['Key']
-                    )
-
-    def upload_file(self, bucket, path, key):
-        """Upload file to s3 bucket."""
+        for obj in self.lister.objects(bucket_name):
+            # generated files, like WebP variants, have no local source
+            if obj['Key'] in self.synced_keys:
+                continue
+            pathname = Path("kitten_web/" + obj['Key'])
+            if not Path.exists(pathname):
+                self.manifest.forget(obj['Key'])
+                print("Deleting {}, non existing object"
+                      .format(obj['Key']))
+                self.s3_res.meta.client.delete_object(
+                    Bucket=bucket_name,
+                    Key=obj['Key']
+                )
+
+    def copy_object(self, bucket, source_key, key, extra_args):
+        """Copy object inside the bucket without uploading data.
+
+        Managed copy switches to multipart copy above the multipart
+        threshold, with the same part size as uploads, so the new object
+        gets the same ETag as the source.
+        """
+        extra_args = dict(extra_args, MetadataDirective='REPLACE')
+        extra_args.pop('ChecksumAlgorithm', None)
+        return bucket.copy(
+            {
+                'Bucket': bucket.name,
+                'Key': source_key
+            },
+            key,
+            ExtraArgs=extra_args,
+            Config=self.TRANSFER_CONFIG
+        )
+
+    def upload_file(self, bucket, path, key, etag=None):
+        """Upload file to s3 bucket.
+
+        etag is precomputed fingerprint of the file, ETag or checksum.
+        """
         content_type = mimetypes.guess_type(key)[0] or 'text/plain'
-        etag = self.gen_etag(path)
+        extra_args = {
+            'ContentType': content_type
+        }
+        if self.checksums:
+            if etag is None:
+                etag = self.checksums.gen_checksum(path)
+            extra_args['Metadata'] = {self.checksums.METADATA: etag}
+            extra_args['ChecksumAlgorithm'] = 'SHA256'
+        elif etag is None:
+            etag = self.gen_etag(path)
+        if self.manifest.get(key, '') != etag:
+            self.reconcile_object(bucket, path, key)
         if self.manifest.get(key, '') == etag:
             # print("Skipping {}, etag.match".format(key))
             return
 
-        print("Uploading {}, new file".format(key))
-        return bucket.upload_file(
-            path,
-            key,
-            ExtraArgs={
-                'ContentType': content_type
-            },
-            Config=self.transfer_config
-        )
+        # keys rewritten by this sync are never copied from, their old
+        # content may still be expected by another key
+        source_key = self.manifest.source(etag, self.changed_keys)
+        result = None
+        if source_key and source_key != key:
+            print("Copying {}, same content as {}".format(key, source_key))
+            try:
+                result = self.copy_object(bucket, source_key, key,
+                                          extra_args)
+            except ClientError as error:
+                # inventory reports list keys deleted since they were taken
+                if error.response['Error']['Code'] not in ('404',
+                                                           'NoSuchKey'):
+                    raise error
+                print("Source {} is gone".format(source_key))
+                self.manifest.forget(source_key)
+                source_key = None
+        if not source_key or source_key == key:
+            print("Uploading {}, new file".format(key))
+            result = bucket.upload_file(
+                path,
+                key,
+                ExtraArgs=extra_args,
+                Config=self.TRANSFER_CONFIG
+            )
+
+        self.manifest.add(key, etag)
+        self.changed_keys[key] = None
+        if self.checksums:
+            self.checksums.forget(key)
+        return result
 
     @staticmethod
     def print_aws_s3_doc():
@@ -214,7 +324,8 @@ class BucketManager:
         )
         return bucket_name_regex.match(bucket_name)
 
-    def sync(self, pathname, bucket_name):
+    def sync(self, pathname, bucket_name, inventory=None, optimizer=None,
+             checksum=False):
         """Sync local folder to s3 bucket."""
         # exit if bucket doesn't exist
         if not self.check_bucket(bucket_name):
@@ -226,20 +337,38 @@ class BucketManager:
         bucket = self.s3_res.Bucket(bucket_name)
         root = Path(pathname).expanduser().resolve()
 
-        self.load_manifest(bucket_name)
+        if inventory:
+            self.load_inventory(bucket_name, inventory)
+        else:
+            self.manifest.load(self.lister.objects(bucket_name))
+
+        files = self.local_files(root)
+        if optimizer:
+            # ETags of optimized outputs decide what gets uploaded
+            files = optimizer.optimize(files)
+        if checksum:
+            self.checksums = ChecksumIndex(self.s3_res.meta.client, root,
+                                           self.MAX_WORKERS * 2)
+            files = list(files)
+            self.checksums.load(bucket_name, self.manifest, files)
+        for path, key in files:
+            self.upload_file(bucket, path, key)
+            self.synced_keys.add(key)
+        if self.checksums:
+            self.checksums.save()
+        ChangeLog(bucket_name).save(list(self.changed_keys))
 
+    @staticmethod
+    def local_files(root):
+        """Generate (path, key) for all files of local folder."""
         def handle_directory(target):
-            """Go recursively via directory and upload all files."""
+            """Go recursively via directory and find all files."""
             for path in target.iterdir():
                 if path.is_dir():
-                    handle_directory(path)
+                    yield from handle_directory(path)
                 if path.is_file():
-                    self.upload_file(
-                        bucket,
-                        str(path),
-                        str(path.relative_to(root))
-                    )
-        handle_directory(root)
+                    yield str(path), str(path.relative_to(root))
+        return handle_directory(root)
 
     def check_bucket(self, bucket_name):
         """Check if bucket exists."""
@@ -265,25 +394,23 @@ class BucketManager:
         # verify if bucket has a valid name
         if not self.is_valid_bucket_name(bucket_name):
             sys.exit(self.print_aws_s3_doc())
-        paginator = self.s3_res.meta.client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket_name):
-            for obj in page.get('Contents', []):
-                pathname = Path("kitten_web/" + obj['Key'])
-                if not Path.exists(pathname):
-                    self.manifest[obj['Key']] = None
-                    print("Deleting {}, non existing object"
-                          .format(obj['Key']))
-                    self.s3_res.meta.client.delete_object(
-                        Bucket=bucket_name,
-                        Key=obj['Key']
-                    )
-                else:
-                    self.manifest[obj['Key']] = None
-                    print("Deleting {}, object"
-                          .format(obj['Key']))
-                    self.s3_res.meta.client.delete_object(
-                        Bucket=bucket_name,
-                        Key=obj['Key']
-                    )
+        for obj in self.lister.objects(bucket_name):
+            pathname = Path("kitten_web/" + obj['Key'])
+            if not Path.exists(pathname):
+                self.manifest[obj['Key']] = None
+                print("Deleting {}, non existing object"
+                      .format(obj['Key']))
+                self.s3_res.meta.client.delete_object(
+                    Bucket=bucket_name,
+                    Key=obj['Key']
+                )
+            else:
+                self.manifest[obj['Key']] = None
+                print("Deleting {}, object"
+                      .format(obj['Key']))
+                self.s3_res.meta.client.delete_object(
+                    Bucket=bucket_name,
+                    Key=obj['Key']
+                )
         print("Deleting {} bucket".format(bucket_name))
         self.s3_res.Bucket(bucket_name).delete()
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for local file hash cache."""
+
+import json
+import os
+import threading
+from hashlib import sha1
+from webotron import util
+
+
+class HashCache:
+    """Cache hashes of local files, keyed by path, size and mtime.
+
+    One JSON file per local directory is kept in the webotron cache
+    directory. An entry is valid as long as the file's size and
+    modification time didn't change. Hashes of bucket objects are kept
+    too, valid as long as the object's ETag didn't change.
+    """
+
+    def __init__(self, root):
+        """Create a HashCache object for a local directory."""
+        self.root = root
+        name = sha1(str(root).encode('utf-8')).hexdigest()
+        self.path = util.cache_dir() / 'hashes-{}.json'.format(name)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            self.entries = data['files']
+            self.objects = data['objects']
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+            self.objects = {}
+
+    def _key(self, path):
+        """Get cache key of a file, files outside root use full path."""
+        try:
+            return str(path.relative_to(self.root))
+        except ValueError:
+            return str(path)
+
+    @staticmethod
+    def _signature(path):
+        """Get size and modification time of a file."""
+        stat = path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, path, kind='etag'):
+        """Get cached hash of a file, or None if file changed."""
+        entry = self.entries.get(self._key(path))
+        if not entry or entry['stat'] != self._signature(path):
+            return None
+        return entry.get(kind)
+
+    def put(self, path, value, kind='etag'):
+        """Store hash of a file."""
+        signature = self._signature(path)
+        with self.lock:
+            entry = self.entries.get(self._key(path))
+            if not entry or entry['stat'] != signature:
+                entry = {'stat': signature}
+                self.entries[self._key(path)] = entry
+            entry[kind] = value
+
+    def get_object(self, key, etag, kind='sha256'):
+        """Get (found, hash) of an object, not found if ETag changed."""
+        entry = self.objects.get(key)
+        if not entry or entry['etag'] != etag or kind not in entry:
+            return False, None
+        return True, entry[kind]
+
+    def put_object(self, key, etag, value, kind='sha256'):
+        """Store hash of an object, None if it has none."""
+        with self.lock:
+            entry = self.objects.get(key)
+            if not entry or entry['etag'] != etag:
+                entry = {'etag': etag}
+                self.objects[key] = entry
+            entry[kind] = value
+
+    def forget_object(self, key):
+        """Drop stored hashes of an object, e.g. after it was rewritten."""
+        with self.lock:
+            self.objects.pop(key, None)
+
+    def save(self):
+        """Write cache file."""
+        temp_path = self.path.with_suffix('.tmp')
+        with self.lock:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'files': self.entries, 'objects': self.objects},
+                          file)
+            os.replace(temp_path, self.path)
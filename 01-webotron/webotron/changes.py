@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for keys changed by the last sync."""
+
+import json
+import os
+from webotron import util
+
+
+class ChangeLog:
+    """Keys uploaded or copied by the last sync to a bucket.
+
+    Kept in the webotron cache directory, so warm can request only
+    the objects that changed.
+    """
+
+    def __init__(self, bucket_name):
+        """Create a ChangeLog object for a bucket."""
+        self.bucket_name = bucket_name
+        self.path = util.cache_dir() / 'last-sync-{}.json'.format(bucket_name)
+
+    def save(self, keys):
+        """Remember keys changed by sync."""
+        temp = self.path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump({'bucket': self.bucket_name, 'keys': keys}, file)
+        os.replace(temp, self.path)
+
+    def load(self):
+        """Get keys changed by the last sync, empty if there was none."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)['keys']
+        except (OSError, ValueError, KeyError):
+            return []
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for SHA-256 checksums of local files and bucket objects."""
+
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+from webotron.cache import HashCache
+
+
+class ChecksumIndex:
+    """Compare files with objects by SHA-256 checksum instead of ETag.
+
+    ETags are no MD5 for SSE-KMS objects or objects uploaded by other
+    tools, so checksums are taken from webotron metadata or from S3
+    additional checksums. Local and remote checksums are both kept in
+    the hash cache of the local directory, remote ones keyed by object
+    key and listed ETag.
+    """
+
+    METADATA = 'webotron-sha256'
+    CHUNK_SIZE = 8388608
+
+    def __init__(self, client, root, max_workers=16):
+        """Create a ChecksumIndex object for a local directory."""
+        self.client = client
+        self.cache = HashCache(root)
+        self.max_workers = max_workers
+
+    def gen_checksum(self, filepath):
+        """Generate SHA-256 hex digest of local file, using hash cache."""
+        path = Path(filepath)
+        digest = self.cache.get(path, 'sha256')
+        if digest:
+            return digest
+
+        file_hash = sha256()
+        with open(filepath, 'rb') as file:
+            for data in iter(lambda: file.read(self.CHUNK_SIZE), b''):
+                file_hash.update(data)
+        digest = file_hash.hexdigest()
+        self.cache.put(path, digest, 'sha256')
+        return digest
+
+    def remote_checksum(self, key, head):
+        """Get SHA-256 hex digest of an object from head_object response."""
+        digest = head.get('Metadata', {}).get(self.METADATA)
+        if not digest:
+            # multipart uploads have checksum of checksums with -N suffix
+            checksum = head.get('ChecksumSHA256')
+            if checksum and '-' not in checksum:
+                digest = base64.b64decode(checksum).hex()
+        self.cache.put_object(key, head['ETag'], digest)
+        return digest
+
+    def head(self, bucket_name, key, etag):
+        """Get checksum of an object, asking S3 only if its ETag changed."""
+        found, digest = self.cache.get_object(key, etag)
+        if found:
+            return digest
+        response = self.client.head_object(
+            Bucket=bucket_name,
+            Key=key,
+            ChecksumMode='ENABLED'
+        )
+        return self.remote_checksum(key, response)
+
+    def forget(self, key):
+        """Drop cached checksum of an object rewritten by sync.
+
+        Same bytes give the same ETag again, which would keep an old
+        entry without checksum valid, so the next sync asks S3 once.
+        """
+        self.cache.forget_object(key)
+
+    def load(self, bucket_name, manifest, files):
+        """Replace manifest ETags with SHA-256 checksums.
+
+        Only keys present locally with matching size are looked up, in
+        parallel. Other keys keep their ETag, which never equals a
+        checksum, so the files get uploaded.
+        """
+        keys = []
+        for path, key in files:
+            size = os.path.getsize(path)
+            if key in manifest and manifest.sizes.get(key, size) == size:
+                keys.append(key)
+
+        manifest.index.clear()
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            digests = executor.map(
+                lambda key: self.head(bucket_name, key, manifest[key]),
+                keys
+            )
+            for key, digest in zip(keys, digests):
+                manifest.add(key, digest)
+
+    def save(self):
+        """Write hash cache."""
+        self.cache.save()
@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for S3 Inventory reports."""
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import unquote_plus, urlparse
+
+# pyarrow is optional, only needed for ORC and Parquet reports
+try:
+    from pyarrow import orc, parquet
+except ImportError as error:
+    orc = parquet = None
+    PYARROW_ERROR = error
+else:
+    PYARROW_ERROR = None
+
+
+class InventoryReader:
+    """Read an S3 Inventory report from S3 or from a local directory.
+
+    Location is either s3://bucket/prefix/.../manifest.json or a local
+    directory holding manifest.json and the data files, which makes it
+    easy to replace the inventory bucket with a fixture directory.
+    https://docs.aws.amazon.com/AmazonS3/latest/dev/storage-inventory.html
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+
+    def __init__(self, session, location):
+        """Create an InventoryReader object."""
+        self.session = session
+        self.s3_client = None
+        self.manifest = None
+        url = urlparse(location)
+        if url.scheme == 's3':
+            self.s3_client = self.session.client('s3')
+            self.bucket_name = url.netloc
+            self.manifest_key = url.path.lstrip('/')
+            if not self.manifest_key.endswith(self.MANIFEST_NAME):
+                self.manifest_key = self.manifest_key.rstrip('/') + \
+                    '/' + self.MANIFEST_NAME
+        else:
+            path = Path(location).expanduser().resolve()
+            if path.is_dir():
+                path = path / self.MANIFEST_NAME
+            self.root = path.parent
+            self.manifest_key = path.name
+
+    def open_file(self, key):
+        """Open report file for binary reading."""
+        if self.s3_client:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=key
+            )
+            return response['Body']
+
+        # data file keys are full destination bucket keys, look them up
+        # relative to the report directory and its data/ subdirectory
+        for path in (self.root / key,
+                     self.root / 'data' / Path(key).name,
+                     self.root / Path(key).name):
+            if path.is_file():
+                return open(path, 'rb')
+        raise FileNotFoundError(
+            "Inventory file {} not found in {}".format(key, self.root))
+
+    def load(self):
+        """Load inventory manifest.json."""
+        if self.manifest is None:
+            with self.open_file(self.manifest_key) as file:
+                self.manifest = json.loads(file.read())
+        return self.manifest
+
+    @property
+    def source_bucket(self):
+        """Return name of the bucket the inventory lists."""
+        return self.load()['sourceBucket']
+
+    @property
+    def timestamp(self):
+        """Return the time the inventory was taken."""
+        millis = int(self.load()['creationTimestamp'])
+        return datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+
+    def objects(self):
+        """Generate (key, etag) for current objects listed in the report."""
+        manifest = self.load()
+        file_format = manifest['fileFormat'].upper()
+        if file_format not in ('CSV', 'ORC', 'PARQUET'):
+            raise ValueError(
+                "Unsupported inventory format {}".format(file_format))
+        columns = [
+            name.strip() for name in manifest['fileSchema'].split(',')
+        ]
+
+        for data_file in manifest['files']:
+            if file_format == 'CSV':
+                rows = self.read_csv(data_file['key'], columns)
+            else:
+                rows = self.read_columnar(data_file['key'], file_format)
+            for row in rows:
+                if str(row.get('IsLatest', 'true')).lower() != 'true' or \
+                        str(row.get('IsDeleteMarker', '')).lower() == 'true':
+                    continue
+                # listing returns quoted ETags, inventory doesn't
+                yield row['Key'], '"{}"'.format(row['ETag'])
+
+    def read_csv(self, key, columns):
+        """Stream rows of a gzipped CSV data file."""
+        with self.open_file(key) as raw:
+            with gzip.GzipFile(fileobj=raw) as data:
+                text = io.TextIOWrapper(data, encoding='utf-8', newline='')
+                for values in csv.reader(text):
+                    row = dict(zip(columns, values))
+                    row['Key'] = unquote_plus(row['Key'])
+                    yield row
+
+    def read_columnar(self, key, file_format):
+        """Stream rows of an ORC or Parquet data file batch by batch."""
+        if PYARROW_ERROR:
+            raise RuntimeError(
+                "Reading {} inventory requires pyarrow, "
+                "pip install pyarrow".format(file_format)) from PYARROW_ERROR
+
+        names = {
+            'key': 'Key',
+            'e_tag': 'ETag',
+            'is_latest': 'IsLatest',
+            'is_delete_marker': 'IsDeleteMarker'
+        }
+        # both formats need random access, spool the file to disk first
+        with tempfile.TemporaryFile() as local, self.open_file(key) as raw:
+            for chunk in iter(lambda: raw.read(1024 * 1024), b''):
+                local.write(chunk)
+            local.seek(0)
+            if file_format == 'PARQUET':
+                batches = parquet.ParquetFile(local).iter_batches()
+            else:
+                orc_file = orc.ORCFile(local)
+                batches = (
+                    orc_file.read_stripe(i)
+                    for i in range(orc_file.nstripes)
+                )
+            for batch in batches:
+                for record in batch.to_pylist():
+                    yield {
+                        names[name]: value
+                        for name, value in record.items()
+                        if name in names
+                    }
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for parallel S3 bucket listing."""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BucketLister:  # pylint: disable=too-few-public-methods
+    """List S3 bucket objects concurrently, one shard per key prefix.
+
+    Prefix structure is discovered with Delimiter listings, every prefix
+    found is then listed in its own thread and all pages are merged into
+    a single stream. Pages go through a bounded queue, so memory use
+    doesn't depend on bucket size.
+    """
+
+    DONE = object()
+
+    def __init__(self, client, max_workers=8, depth=1, delimiter='/'):
+        """Create a BucketLister object."""
+        self.client = client
+        self.max_workers = max_workers
+        self.depth = depth
+        self.delimiter = delimiter
+
+    def objects(self, bucket_name, prefix=''):
+        """Generate all objects of a bucket under a prefix, in any order."""
+        pages = queue.Queue(maxsize=self.max_workers * 2)
+        stop = threading.Event()
+        lock = threading.Lock()
+        pending = [0]
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def put(item):
+            """Put item on the queue unless the consumer went away."""
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def run(task, *args):
+            """Run listing task, report errors and completion."""
+            try:
+                task(*args)
+            except Exception as error:  # pylint: disable=broad-except
+                put(error)
+            finally:
+                with lock:
+                    pending[0] -= 1
+                    if pending[0] == 0:
+                        put(self.DONE)
+
+        def submit(task, *args):
+            """Schedule listing task."""
+            with lock:
+                pending[0] += 1
+            executor.submit(run, task, *args)
+
+        def list_shard(shard_prefix):
+            """List all objects under a prefix."""
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket_name,
+                                           Prefix=shard_prefix):
+                if stop.is_set():
+                    return
+                if page.get('Contents'):
+                    put(page['Contents'])
+
+        def discover(shard_prefix, depth):
+            """List one level of a prefix and schedule its sub prefixes."""
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket_name,
+                                           Prefix=shard_prefix,
+                                           Delimiter=self.delimiter):
+                if stop.is_set():
+                    return
+                # objects stored directly at this level
+                if page.get('Contents'):
+                    put(page['Contents'])
+                for common_prefix in page.get('CommonPrefixes', []):
+                    if depth > 1:
+                        submit(discover, common_prefix['Prefix'], depth - 1)
+                    else:
+                        submit(list_shard, common_prefix['Prefix'])
+
+        submit(discover, prefix, self.depth)
+        try:
+            while True:
+                item = pages.get()
+                if item is self.DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
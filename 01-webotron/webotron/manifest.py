@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for the known state of bucket objects."""
+
+
+class Manifest(dict):
+    """ETag of every known key, with sizes and reverse ETag index.
+
+    Deleted objects stay as keys with None ETag. index maps content
+    ETag to the keys currently holding it, timestamp is set when the
+    manifest comes from an inventory report instead of a listing.
+    """
+
+    def __init__(self):
+        """Create an empty Manifest."""
+        super().__init__()
+        self.sizes = {}
+        self.index = {}
+        self.timestamp = None
+
+    def _unindex(self, key):
+        """Remove key from holders of its current ETag."""
+        etag = self.get(key)
+        holders = self.index.get(etag)
+        if holders:
+            holders.pop(key, None)
+            if not holders:
+                del self.index[etag]
+
+    def add(self, key, etag, size=None):
+        """Remember object of a key, replacing what it held before."""
+        self._unindex(key)
+        self[key] = etag
+        if size is None:
+            self.sizes.pop(key, None)
+        else:
+            self.sizes[key] = size
+        if etag:
+            # reverse index to find content already stored in the bucket,
+            # dict keeps holders in insertion order
+            self.index.setdefault(etag, {})[key] = None
+
+    def load(self, objects):
+        """Fill manifest from listed objects."""
+        for obj in objects:
+            self.add(obj['Key'], obj['ETag'], obj['Size'])
+
+    def forget(self, key):
+        """Mark object of a key deleted."""
+        self._unindex(key)
+        self[key] = None
+
+    def source(self, etag, exclude=()):
+        """Get a key holding content with etag, None if there is none."""
+        for key in self.index.get(etag, ()):
+            if key not in exclude:
+                return key
+        return None
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for optimizing site assets before upload.
+
+Optimizers are optional, every one of them is used only when its
+package or tool is installed:
+- minify_html for HTML, rcssmin for CSS, rjsmin for JavaScript
+- Pillow for lossless PNG recompression and WebP variants
+- jpegtran binary for lossless JPEG recompression
+"""
+
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+from pathlib import Path
+from webotron import util
+
+try:
+    import minify_html
+except ImportError:
+    minify_html = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# bump to invalidate cached outputs when optimizers change
+OPTIMIZER_VERSION = b'1'
+
+mimetypes.add_type('image/webp', '.webp')
+
+
+def minify_html_data(data):
+    """Minify HTML document."""
+    if not minify_html:
+        return data
+    return minify_html.minify(
+        data.decode('utf-8'),
+        minify_css=True,
+        minify_js=True
+    ).encode('utf-8')
+
+
+def minify_css_data(data):
+    """Minify CSS stylesheet."""
+    if not rcssmin:
+        return data
+    return rcssmin.cssmin(data.decode('utf-8')).encode('utf-8')
+
+
+def minify_js_data(data):
+    """Minify JavaScript."""
+    if not rjsmin:
+        return data
+    return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+
+
+def recompress_png(data):
+    """Recompress PNG losslessly."""
+    if not Image:
+        return data
+    output = BytesIO()
+    with Image.open(BytesIO(data)) as image:
+        image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def recompress_jpeg(data):
+    """Recompress JPEG losslessly, optimizing Huffman tables."""
+    jpegtran = shutil.which('jpegtran')
+    if not jpegtran:
+        return data
+    result = subprocess.run(
+        [jpegtran, '-copy', 'all', '-optimize', '-progressive'],
+        input=data,
+        stdout=subprocess.PIPE,
+        check=True
+    )
+    return result.stdout
+
+
+def convert_webp(data):
+    """Convert PNG or JPEG image to WebP."""
+    output = BytesIO()
+    with Image.open(BytesIO(data)) as image:
+        lossless = image.format == 'PNG'
+        image.save(output, format='WEBP', lossless=lossless, quality=80)
+    return output.getvalue()
+
+
+OPTIMIZERS = {
+    '.html': minify_html_data,
+    '.htm': minify_html_data,
+    '.css': minify_css_data,
+    '.js': minify_js_data,
+    '.png': recompress_png,
+    '.jpg': recompress_jpeg,
+    '.jpeg': recompress_jpeg
+}
+WEBP_SUFFIXES = ('.png', '.jpg', '.jpeg')
+
+
+def write_output(path, data):
+    """Write cache file atomically."""
+    handle, temp_path = tempfile.mkstemp(dir=str(path.parent))
+    with os.fdopen(handle, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, str(path))
+
+
+def run_optimizer(optimizer, path, data):
+    """Run optimizer on file data, None if it fails."""
+    try:
+        return optimizer(data)
+    # optimizers are third party code raising anything on bad input
+    except Exception as error:  # pylint: disable=broad-except
+        print("Not optimizing {}: {}".format(path, error))
+        return None
+
+
+def optimize_file(path, cache_dir, webp):
+    """Optimize one file, return (output path, webp path or None).
+
+    Outputs are stored in cache_dir under hash of the source content,
+    so unchanged files are never processed twice. Output is the source
+    file itself when optimizing fails or doesn't make it smaller.
+    """
+    suffix = Path(path).suffix.lower()
+    optimizer = OPTIMIZERS.get(suffix)
+    if not optimizer:
+        return path, None
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    digest = sha256(OPTIMIZER_VERSION + data).hexdigest()
+
+    output = Path(cache_dir) / (digest + suffix)
+    skipped = Path(cache_dir) / (digest + suffix + '.skip')
+    if not output.exists() and not skipped.exists():
+        optimized = run_optimizer(optimizer, path, data)
+        if optimized is not None and len(optimized) < len(data):
+            write_output(output, optimized)
+        else:
+            write_output(skipped, b'')
+    output_path = str(output) if output.exists() else path
+
+    webp_path = None
+    if webp and Image and suffix in WEBP_SUFFIXES:
+        webp_output = Path(cache_dir) / (digest + '.webp')
+        if not webp_output.exists():
+            converted = run_optimizer(convert_webp, path, data)
+            if converted is not None:
+                write_output(webp_output, converted)
+        if webp_output.exists():
+            webp_path = str(webp_output)
+
+    return output_path, webp_path
+
+
+class AssetOptimizer:  # pylint: disable=too-few-public-methods
+    """Optimize site assets in a process pool, caching the outputs."""
+
+    def __init__(self, webp=False, max_workers=None):
+        """Create an AssetOptimizer object."""
+        self.webp = webp
+        self.max_workers = max_workers
+        self.cache_dir = util.cache_dir() / 'optimized'
+        self.cache_dir.mkdir(exist_ok=True)
+
+    def optimize(self, files):
+        """Generate (path, key) of optimized files for (path, key) files.
+
+        WebP variants are added under the original key plus .webp.
+        """
+        files = list(files)
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            results = executor.map(
+                optimize_file,
+                [path for path, _ in files],
+                [str(self.cache_dir)] * len(files),
+                [self.webp] * len(files),
+                chunksize=8
+            )
+            for (_, key), (output_path, webp_path) in zip(files, results):
+                yield output_path, key
+                if webp_path:
+                    yield webp_path, key + '.webp'
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for downloading a bucket to a local folder."""
+
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from webotron.bucket import BucketManager
+from webotron.cache import HashCache
+
+
+class PullManager:
+    """Download bucket content, skipping files that didn't change."""
+
+    def __init__(self, session):
+        """Create a PullManager object."""
+        self.manager = BucketManager(session)
+
+    def download_range(self, bucket_name, key, temp_path, first, last):
+        """Download byte range of an object into preallocated file."""
+        response = self.manager.s3_res.meta.client.get_object(
+            Bucket=bucket_name,
+            Key=key,
+            IfMatch=self.manager.manifest[key],
+            Range='bytes={}-{}'.format(first, last)
+        )
+        with open(temp_path, 'r+b') as file:
+            file.seek(first)
+            for chunk in response['Body'].iter_chunks(1024 * 1024):
+                file.write(chunk)
+
+    def download_file(self, bucket_name, key, path, range_pool):
+        """Download object atomically, using parallel ranged GETs."""
+        size = self.manager.manifest.sizes[key]
+        chunk_size = self.manager.CHUNK_SIZE
+        print("Downloading {}".format(key))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # temp file in the same directory, so rename is atomic
+        handle, temp_path = tempfile.mkstemp(
+            dir=str(path.parent),
+            prefix='.{}.'.format(path.name)
+        )
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.truncate(size)
+            ranges = [
+                (first, min(first + chunk_size, size) - 1)
+                for first in range(0, size, chunk_size)
+            ]
+            futures = [
+                range_pool.submit(self.download_range, bucket_name, key,
+                                  temp_path, first, last)
+                for first, last in ranges
+            ]
+            for future in futures:
+                future.result()
+            os.replace(temp_path, str(path))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def pull_file(self, bucket_name, key, root, cache, range_pool):
+        """Download object unless local file has the same ETag."""
+        path = root / key
+        if key.endswith('/') or root not in path.resolve().parents:
+            print("Skipping {}, not a file key".format(key))
+            return
+
+        etag = self.manager.manifest[key]
+        if path.is_file():
+            local_etag = cache.get(path) or self.manager.gen_etag(str(path))
+            if local_etag == etag:
+                cache.put(path, etag)
+                return
+
+        self.download_file(bucket_name, key, path, range_pool)
+        # remote ETag is valid for this content whatever the part size was
+        cache.put(path, etag)
+
+    def pull(self, bucket_name, pathname):
+        """Download bucket content to local folder."""
+        manager = self.manager
+        # exit if bucket doesn't exist
+        if not manager.check_bucket(bucket_name):
+            sys.exit()
+        # verify if bucket has a valid name
+        if not manager.is_valid_bucket_name(bucket_name):
+            sys.exit(manager.print_aws_s3_doc())
+
+        root = Path(pathname).expanduser().resolve()
+        root.mkdir(parents=True, exist_ok=True)
+        cache = HashCache(root)
+
+        manager.manifest.load(manager.lister.objects(bucket_name))
+
+        # ranged GETs have their own pool, file workers wait on them
+        with ThreadPoolExecutor(manager.MAX_WORKERS) as range_pool, \
+                ThreadPoolExecutor(manager.MAX_WORKERS) as file_pool:
+            futures = [
+                file_pool.submit(self.pull_file, bucket_name, key,
+                                 root, cache, range_pool)
+                for key, etag in manager.manifest.items() if etag
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            finally:
+                cache.save()
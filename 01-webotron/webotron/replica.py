@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for multi-region replica deploys."""
+
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from webotron import util
+from webotron.bucket import BucketManager
+
+ReplicaStats = namedtuple(
+    'ReplicaStats',
+    ['region', 'bucket', 'files', 'size', 'seconds']
+)
+
+
+class ReplicaManager:
+    """Deploy one local folder to buckets in many regions."""
+
+    def __init__(self, session):
+        """Create a ReplicaManager object."""
+        self.session = session
+
+    @staticmethod
+    def scan(pathname, manager):
+        """Hash all local files once, return (path, key, etag, size)."""
+        root = Path(pathname).expanduser().resolve()
+        with ThreadPoolExecutor(manager.MAX_WORKERS) as executor:
+            files = list(manager.local_files(root))
+            etags = executor.map(manager.gen_etag, (p for p, _ in files))
+            return [
+                (path, key, etag, os.path.getsize(path))
+                for (path, key), etag in zip(files, etags)
+            ]
+
+    @staticmethod
+    def sync_region(manager, region, bucket_name, files):
+        """Upload changed files to one regional bucket."""
+        if not manager.check_bucket(bucket_name):
+            sys.exit()
+        if not manager.is_valid_bucket_name(bucket_name):
+            sys.exit(manager.print_aws_s3_doc())
+
+        start = time.perf_counter()
+        bucket = manager.s3_res.Bucket(bucket_name)
+        manager.manifest.load(manager.lister.objects(bucket_name))
+        count = 0
+        size = 0
+        for path, key, etag, file_size in files:
+            if manager.manifest.get(key, '') != etag:
+                count += 1
+                size += file_size
+            manager.upload_file(bucket, path, key, etag)
+
+        return ReplicaStats(region, bucket_name, count, size,
+                            time.perf_counter() - start)
+
+    def sync(self, pathname, replicas):
+        """Sync local folder to {region: bucket_name} replicas."""
+        managers = {
+            region: BucketManager(self.session, region)
+            for region in replicas
+        }
+        files = self.scan(pathname, next(iter(managers.values())))
+        print("Hashed {} local files".format(len(files)))
+
+        stats = []
+        with ThreadPoolExecutor(len(replicas)) as executor:
+            futures = [
+                executor.submit(self.sync_region, managers[region],
+                                region, bucket_name, files)
+                for region, bucket_name in replicas.items()
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                stats.append(result)
+                print("{}: {} files, {:.1f} MB in {:.1f}s ({:.2f} MB/s) "
+                      "http://{}.{}".format(
+                          result.region, result.files,
+                          result.size / 2**20, result.seconds,
+                          result.size / 2**20 / max(result.seconds, 0.001),
+                          result.bucket,
+                          util.get_endpoint(result.region).host))
+
+        return stats
@@ -2,7 +2,9 @@
 
 """Utilities for webotron."""
 
+import os
 from collections import namedtuple
+from pathlib import Path
 
 Endpoint = namedtuple('Endpoint', ['name', 'host', 'zone'])
 
@@ -83,6 +85,14 @@ def known_region(region):
     return region in region_to_endpoint
 
 
+def cache_dir():
+    """Get directory for webotron local caches."""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    path = Path(base) / 'webotron'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
 def get_endpoint(region):
     """Get the s3 website hosting endpoint for this region."""
     return region_to_endpoint[region]
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Classes for warming CloudFront edge caches."""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+WarmResult = namedtuple(
+    'WarmResult',
+    ['key', 'encoding', 'status', 'cache', 'seconds']
+)
+
+
+def percentile(values, percent):
+    """Get percentile of a list of values."""
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))),
+                len(ordered) - 1)
+    return ordered[index]
+
+
+class EdgeWarmer:
+    """Request objects through a distribution to fill its edge cache."""
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self, base_url, host=None, max_workers=16, timeout=10):
+        """Create an EdgeWarmer object.
+
+        host overrides the Host header, for requests sent to an
+        endpoint other than the distribution domain.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.host = host
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def fetch(self, key, encoding=None):
+        """Request one object, read it whole so the edge caches it."""
+        request = Request(self.base_url + '/' + quote(key))
+        if encoding:
+            request.add_header('Accept-Encoding', encoding)
+        if self.host:
+            request.add_header('Host', self.host)
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                while response.read(self.CHUNK_SIZE):
+                    pass
+                status = response.status
+                cache = response.headers.get('X-Cache', '')
+        except HTTPError as error:
+            status = error.code
+            cache = error.headers.get('X-Cache', '')
+        except (URLError, OSError) as error:
+            status = None
+            cache = str(error)
+        return WarmResult(key, encoding, status, cache,
+                          time.perf_counter() - start)
+
+    def warm(self, keys, encodings=(None,)):
+        """Request every key in every encoding variant concurrently."""
+        requests = [(key, encoding) for key in keys for encoding in encodings]
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            return list(executor.map(lambda args: self.fetch(*args),
+                                     requests))
+
+    @staticmethod
+    def report(results):
+        """Print hit/miss ratio and latency percentiles."""
+        if not results:
+            print("Nothing to warm")
+            return
+        hits = sum(1 for result in results
+                   if result.cache.lower().startswith('hit'))
+        misses = sum(1 for result in results
+                     if result.cache.lower().startswith('miss'))
+        failed = [result for result in results
+                  if result.status is None or result.status >= 400]
+        for result in failed:
+            print("Failed {} ({}): {}".format(
+                result.key, result.encoding or 'identity',
+                result.status or result.cache))
+        latencies = [result.seconds * 1000 for result in results]
+        print("{} requests: {} hits ({:.0%}), {} misses ({:.0%}), "
+              "{} failed".format(len(results), hits, hits / len(results),
+                                 misses, misses / len(results), len(failed)))
+        print("latency p50 {:.1f} ms, p90 {:.1f} ms, p99 {:.1f} ms".format(
+            percentile(latencies, 50), percentile(latencies, 90),
+            percentile(latencies, 99)))
@@ -12,14 +12,20 @@ Webotron automates the process of deploying static websites to AWS
 - Configure a Content Delivery Network and SSL with AWS CloudFront
 """
 
+import json
 import sys
-import boto3
+import awsclients
 import click
 from webotron import util
 from webotron.bucket import BucketManager
+from webotron.changes import ChangeLog
 from webotron.cdn import DistributionManager
+from webotron.optimize import AssetOptimizer
+from webotron.pull import PullManager
 from webotron.domain import DomainManager
 from webotron.acm import CertificateManager
+from webotron.replica import ReplicaManager
+from webotron.warmer import EdgeWarmer
 
 
 SESSION = None
@@ -47,7 +53,7 @@ def cli(profile, region):
     if region:
         session_cfg['region_name'] = region
 
-    SESSION = boto3.Session(**session_cfg)
+    SESSION = awsclients.session(**session_cfg)
     BUCKET_MANAGER = BucketManager(SESSION)
     DOMAIN_MANAGER = DomainManager(SESSION)
     CERTIFICATE_MANAGER = CertificateManager(SESSION)
@@ -62,11 +68,18 @@ def list_buckets():
 
 
 @cli.command('list-bucket-objects')
+@click.option('--prefix', default='',
+              help="List only objects with keys starting with prefix.")
+@click.option('-j', '--json-lines', is_flag=True,
+              help="Print every object as a JSON document in own line.")
 @click.argument('bucket')
-def list_bucket_objects(bucket):
+def list_bucket_objects(prefix, json_lines, bucket):
     """List objects in s3 bucket."""
-    for obj in BUCKET_MANAGER.all_objects(bucket):
-        print(obj)
+    for obj in BUCKET_MANAGER.all_objects(bucket, prefix):
+        if json_lines:
+            print(json.dumps(obj, default=str))
+        else:
+            print(obj['Key'])
 
 
 @cli.command('setup-bucket')
@@ -82,18 +95,64 @@ def setup_bucket(bucket):
 @click.option('-d', '--delete', is_flag=True,
               help="Files that exist in the destination\
                but not in the source are deleted during sync.")
+@click.option('-i', '--inventory', default=None,
+              help="Load bucket state from S3 Inventory report \
+              (s3://bucket/path/manifest.json or local directory) \
+              instead of listing the bucket.")
+@click.option('-o', '--optimize', is_flag=True,
+              help="Minify HTML/CSS/JS and recompress images \
+              before upload.")
+@click.option('--webp', is_flag=True,
+              help="With --optimize, also upload WebP variants of images.")
+@click.option('-c', '--checksum', is_flag=True,
+              help="Detect changes with SHA-256 checksums instead of \
+              ETags, for SSE-KMS buckets or files uploaded by other tools.")
 @click.argument('pathname', type=click.Path(exists=True))
 @click.argument('bucket')
-def sync(delete, pathname, bucket):
+def sync(pathname, bucket, **options):
     """Sync content of local directory to bucket."""
-    BUCKET_MANAGER.sync(pathname, bucket)
-    if delete:
+    optimizer = AssetOptimizer(options['webp']) \
+        if options['optimize'] else None
+    BUCKET_MANAGER.sync(pathname, bucket, options['inventory'], optimizer,
+                        options['checksum'])
+    if options['delete']:
         BUCKET_MANAGER.delete_missing_objects(bucket)
 
     print("bucket url: " +
           BUCKET_MANAGER.get_bucket_url(BUCKET_MANAGER.s3_res.Bucket(bucket)))
 
 
+@cli.command('sync-replicas')
+@click.argument('pathname', type=click.Path(exists=True))
+@click.argument('replicas', nargs=-1, required=True)
+def sync_replicas(pathname, replicas):
+    """Sync local directory to buckets in many regions.
+
+    REPLICAS are given as REGION:BUCKET, e.g. eu-west-1:site-eu
+    """
+    targets = {}
+    for replica in replicas:
+        region, _, bucket = replica.partition(':')
+        if not bucket or not util.known_region(region):
+            sys.exit("Invalid replica {}, use REGION:BUCKET \
+                     with a known region".format(replica))
+        # one manager per region, a second bucket would be dropped silently
+        if region in targets:
+            sys.exit("Region {} given twice, \
+                     use one bucket per region".format(region))
+        targets[region] = bucket
+
+    ReplicaManager(SESSION).sync(pathname, targets)
+
+
+@cli.command('pull')
+@click.argument('bucket')
+@click.argument('pathname', type=click.Path())
+def pull(bucket, pathname):
+    """Download content of bucket to local directory."""
+    PullManager(SESSION).pull(bucket, pathname)
+
+
 @cli.command('delete-bucket')
 @click.argument('bucket')
 def delete_bucket(bucket):
@@ -146,6 +205,43 @@ def setup_cdn(domain):
     print("Domain configured: https://{}".format(domain))
 
 
+@cli.command('warm')
+@click.option('-b', '--bucket', default=None,
+              help="Bucket synced to the distribution, DOMAIN by default.")
+@click.option('-a', '--all', 'all_keys', is_flag=True,
+              help="Warm every object of the bucket instead of the keys \
+              changed by the last sync.")
+@click.option('-e', '--encoding', 'encodings', multiple=True,
+              help="Also request with this Accept-Encoding, \
+              e.g. -e gzip -e br.")
+@click.option('-w', '--workers', default=16,
+              help="Requests sent at the same time.")
+@click.option('--endpoint', default=None,
+              help="Send requests to this URL instead of the distribution \
+              domain, e.g. a local HTTP server.")
+@click.argument('domain')
+def warm(domain, **options):
+    """Request synced objects through CloudFront to fill edge caches."""
+    bucket = options['bucket'] or domain
+    workers = options['workers']
+    if options['all_keys']:
+        keys = [obj['Key'] for obj in BUCKET_MANAGER.all_objects(bucket)]
+    else:
+        keys = ChangeLog(bucket).load()
+
+    if options['endpoint']:
+        warmer = EdgeWarmer(options['endpoint'], domain, workers)
+    else:
+        dist = DIST_MANAGER.find_matching_dist(domain)
+        if not dist:
+            sys.exit("There is no distribution named {}".format(domain))
+        warmer = EdgeWarmer('https://' + dist['DomainName'],
+                            max_workers=workers)
+
+    variants = [None] + list(options['encodings'])
+    EdgeWarmer.report(warmer.warm(keys, variants))
+
+
 @cli.command('delete-cdn')
 @click.argument('domain')
 def delete_cdn(domain):
@@ -0,0 +1,132 @@
+# coding: utf-8
+"""Resolve newest AMI matching a name pattern, in many regions at once."""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import awsclients
+import click
+
+AMAZON_LINUX_2 = 'amzn2-ami-hvm-2.0.*-x86_64-gp2'
+TTL = 3600
+
+
+def cache_path():
+    """Get path of the AMI cache file."""
+    root = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(root) / 'notifon' / 'amis.json'
+
+
+class AmiResolver:
+    """Find image ids with server side filters and remember them on disk."""
+
+    def __init__(self, session, owners=('amazon',), architecture='x86_64',
+                 virtualization='hvm', ttl=TTL, path=None):
+        """Create AmiResolver."""
+        self.session = session
+        self.owners = list(owners)
+        self.architecture = architecture
+        self.virtualization = virtualization
+        self.ttl = ttl
+        self.path = Path(path) if path else cache_path()
+        try:
+            with open(self.path) as file:
+                self.cache = json.load(file)
+        except (OSError, ValueError):
+            self.cache = {}
+
+    def cache_key(self, region, name):
+        """Get cache key of a lookup."""
+        return '|'.join([region, ','.join(self.owners), name,
+                         self.architecture, self.virtualization])
+
+    def lookup(self, client, name):
+        """Describe only images matching name, return the newest one."""
+        images = client.describe_images(
+            Owners=self.owners,
+            Filters=[
+                {'Name': 'name', 'Values': [name]},
+                {'Name': 'architecture', 'Values': [self.architecture]},
+                {'Name': 'virtualization-type',
+                 'Values': [self.virtualization]},
+                {'Name': 'state', 'Values': ['available']}
+            ]
+        )['Images']
+        if not images:
+            return None
+        # ISO 8601 dates sort as strings
+        image = max(images, key=lambda image: image['CreationDate'])
+        return {
+            'ImageId': image['ImageId'],
+            'Name': image['Name'],
+            'CreationDate': image['CreationDate'],
+            'ResolvedAt': time.time()
+        }
+
+    def resolve(self, regions, name=AMAZON_LINUX_2, refresh=False):
+        """Get {region: image id} of the newest matching image.
+
+        Regions missing from the cache or older than ttl are looked up
+        concurrently, regions without a match are left out.
+        """
+        now = time.time()
+        stale = [
+            region for region in regions
+            if refresh or
+            now - self.cache.get(self.cache_key(region, name),
+                                 {}).get('ResolvedAt', 0) > self.ttl
+        ]
+        if stale:
+            # session isn't thread safe, create clients before the threads
+            clients = [
+                self.session.client('ec2', region_name=region)
+                for region in stale
+            ]
+            with ThreadPoolExecutor(len(stale)) as executor:
+                found = executor.map(lambda client: self.lookup(client, name),
+                                     clients)
+                for region, image in zip(stale, found):
+                    if image:
+                        self.cache[self.cache_key(region, name)] = image
+            self.save()
+
+        images = {}
+        for region in regions:
+            image = self.cache.get(self.cache_key(region, name))
+            if image:
+                images[region] = image['ImageId']
+        return images
+
+    def save(self):
+        """Write cache atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix('.tmp')
+        with open(temp, 'w') as file:
+            json.dump(self.cache, file, indent=1, sort_keys=True)
+        os.replace(temp, self.path)
+
+
+@click.command()
+@click.argument('regions', nargs=-1)
+@click.option('--name', default=AMAZON_LINUX_2,
+              help="Image name pattern, * is a wildcard.")
+@click.option('--owner', 'owners', multiple=True, default=['amazon'],
+              help="Image owner, can be repeated.")
+@click.option('--ttl', default=TTL, help="Seconds to trust cached images.")
+@click.option('--refresh', is_flag=True, help="Ignore cached images.")
+@click.option('--profile', default='poc', help="Use a given AWS profile.")
+def cli(regions, name, owners, ttl, refresh, profile):
+    """Print newest AMI matching name in REGIONS."""
+    session = awsclients.session(profile_name=profile)
+    resolver = AmiResolver(session, owners, ttl=ttl)
+    regions = regions or [session.region_name]
+    images = resolver.resolve(regions, name, refresh)
+    for region in regions:
+        print("{}\t{}".format(region, images.get(region, '-')))
+
+
+if __name__ == '__main__':
+    cli()
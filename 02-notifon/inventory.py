@@ -0,0 +1,184 @@
+# coding: utf-8
+"""Snapshot instances, security groups and ASGs of all enabled regions."""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+
+import awsclients
+import click
+
+MAX_WORKERS = 16
+LIVE_STATES = ['pending', 'running', 'stopping', 'stopped']
+
+
+def enabled_regions(session):
+    """Get names of regions enabled for the account."""
+    client = session.client('ec2')
+    return sorted(region['RegionName'] for region in client.describe_regions(
+        Filters=[{'Name': 'opt-in-status',
+                  'Values': ['opt-in-not-required', 'opted-in']}]
+    )['Regions'])
+
+
+def paginate(client, operation, key, **params):
+    """Generate items of all pages of an operation."""
+    for page in client.get_paginator(operation).paginate(**params):
+        yield from page[key]
+
+
+def tag(resource, key):
+    """Get value of a tag."""
+    for item in resource.get('Tags', []):
+        if item['Key'] == key:
+            return item['Value']
+    return None
+
+
+def instance_rows(ec2):
+    """Generate rows of instances that are not terminated."""
+    reservations = paginate(
+        ec2, 'describe_instances', 'Reservations',
+        Filters=[{'Name': 'instance-state-name', 'Values': LIVE_STATES}]
+    )
+    for reservation in reservations:
+        for instance in reservation['Instances']:
+            yield {
+                'kind': 'instance',
+                'id': instance['InstanceId'],
+                'name': tag(instance, 'Name'),
+                'type': instance['InstanceType'],
+                'state': instance['State']['Name'],
+                'zone': instance['Placement']['AvailabilityZone'],
+                'image': instance['ImageId'],
+                'asg': tag(instance, 'aws:autoscaling:groupName'),
+                'privateIp': instance.get('PrivateIpAddress'),
+                'launched': instance['LaunchTime'].isoformat()
+            }
+
+
+def security_group_rows(ec2):
+    """Generate rows of security groups."""
+    for group in paginate(ec2, 'describe_security_groups', 'SecurityGroups'):
+        yield {
+            'kind': 'security-group',
+            'id': group['GroupId'],
+            'name': group['GroupName'],
+            'vpc': group.get('VpcId'),
+            'ingress': len(group['IpPermissions']),
+            'egress': len(group.get('IpPermissionsEgress', []))
+        }
+
+
+def asg_rows(autoscaling):
+    """Generate rows of auto scaling groups."""
+    groups = paginate(autoscaling, 'describe_auto_scaling_groups',
+                      'AutoScalingGroups', PaginationConfig={'PageSize': 100})
+    for group in groups:
+        yield {
+            'kind': 'asg',
+            'id': group['AutoScalingGroupName'],
+            'min': group['MinSize'],
+            'max': group['MaxSize'],
+            'desired': group['DesiredCapacity'],
+            'instances': len(group['Instances']),
+            'inService': sum(1 for instance in group['Instances']
+                             if instance['LifecycleState'] == 'InService')
+        }
+
+
+def region_snapshot(session, region):
+    """Get JSON-lines snapshot of a region, sorted to be comparable."""
+    ec2 = session.client('ec2', region_name=region)
+    autoscaling = session.client('autoscaling', region_name=region)
+    rows = list(instance_rows(ec2)) + list(security_group_rows(ec2)) + \
+        list(asg_rows(autoscaling))
+    rows.sort(key=lambda row: (row['kind'], row['id']))
+    lines = [json.dumps(row, sort_keys=True, separators=(',', ':'))
+             for row in rows]
+    return ''.join(line + '\n' for line in lines), len(rows)
+
+
+class Inventory:
+    """Snapshot directory with one JSON-lines file per region.
+
+    state.json keeps time and content digest of every region, regions
+    are written only when their content changes.
+    """
+
+    def __init__(self, session, directory):
+        """Create Inventory."""
+        self.session = session
+        self.directory = Path(directory)
+        try:
+            with open(self.directory / 'state.json') as file:
+                self.state = json.load(file)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def stale_regions(self, regions, max_age):
+        """Get regions refreshed more than max_age seconds ago."""
+        now = time.time()
+        return [region for region in regions
+                if now - self.state.get(region, {}).get('refreshed', 0) >
+                max_age]
+
+    def refresh(self, regions):
+        """Snapshot regions concurrently, return regions that changed."""
+        with ThreadPoolExecutor(min(MAX_WORKERS, len(regions) or 1)) \
+                as executor:
+            snapshots = list(executor.map(
+                lambda region: region_snapshot(self.session, region), regions
+            ))
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        changed = []
+        for region, (content, count) in zip(regions, snapshots):
+            digest = sha256(content.encode('utf-8')).hexdigest()
+            if self.state.get(region, {}).get('digest') != digest:
+                self.write(region + '.jsonl', content)
+                changed.append(region)
+            self.state[region] = {
+                'refreshed': time.time(),
+                'digest': digest,
+                'rows': count
+            }
+        self.write('state.json',
+                   json.dumps(self.state, indent=1, sort_keys=True))
+        return changed
+
+    def write(self, name, content):
+        """Write file of the snapshot atomically."""
+        path = self.directory / name
+        temp = path.with_suffix('.tmp')
+        with open(temp, 'w') as file:
+            file.write(content)
+        os.replace(temp, path)
+
+
+@click.command()
+@click.option('--output', default='inventory', type=click.Path(),
+              help="Snapshot directory.")
+@click.option('--region', 'regions', multiple=True,
+              help="Refresh only this region, can be repeated.")
+@click.option('--max-age', default=0,
+              help="Skip regions refreshed less than this many seconds ago.")
+@click.option('--profile', default='poc', help="Use a given AWS profile.")
+def cli(output, regions, max_age, profile):
+    """Snapshot EC2 instances, security groups and ASGs of all regions."""
+    session = awsclients.session(profile_name=profile)
+    inventory = Inventory(session, output)
+    regions = list(regions) or enabled_regions(session)
+    stale = inventory.stale_regions(regions, max_age)
+    started = time.perf_counter()
+    changed = inventory.refresh(stale)
+    print("Refreshed {} of {} regions in {:.1f}s, changed: {}".format(
+        len(stale), len(regions), time.perf_counter() - started,
+        ', '.join(changed) or 'none'))
+
+
+if __name__ == '__main__':
+    cli()
@@ -1,15 +1,91 @@
 import os
+import json
+from collections import OrderedDict
+import boto3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def post_to_slack(event, context):
-    """Post asg scale up event on the slack."""
-    slack_webhook_url = os.environ['SLACK_WEBHOOK_URL']
-    # using format to reference python dictionary
-    slack_message = "From {source} at {detail[StartTime]}: {detail[Description]}".format(**event)
-    emoji = ':smile:'
+# (connect, read) seconds, webhook calls must not hold the lambda
+TIMEOUT = (
+    float(os.environ.get('SLACK_CONNECT_TIMEOUT', 3.05)),
+    float(os.environ.get('SLACK_READ_TIMEOUT', 5))
+)
+
+# reused across warm invocations
+_HTTP = None
+_SQS = None
+
+def retry_policy():
+    """Retry failed and throttled posts with exponential backoff."""
+    params = {
+        'total': 3,
+        'backoff_factor': 0.5,
+        'status_forcelist': (429, 500, 502, 503, 504),
+        'raise_on_status': False
+    }
+    try:
+        return Retry(allowed_methods=frozenset(['POST']), **params)
+    except TypeError:
+        # urllib3 before 1.26
+        return Retry(method_whitelist=frozenset(['POST']), **params)
+
+def http_session():
+    """Get pooled http session."""
+    global _HTTP
+    if _HTTP is None:
+        _HTTP = requests.Session()
+        _HTTP.mount('https://', HTTPAdapter(max_retries=retry_policy()))
+    return _HTTP
+
+def sqs_client():
+    """Get sqs client, SQS_ENDPOINT_URL points to a local stand-in."""
+    global _SQS
+    if _SQS is None:
+        _SQS = boto3.client('sqs',
+                            endpoint_url=os.environ.get('SQS_ENDPOINT_URL'))
+    return _SQS
+
+def send_message(text):
+    """Send message to the slack webhook."""
     data = { "username": post_to_slack.__name__,
-            "text": slack_message,
-             "icon_emoji": emoji}
-    requests.post(slack_webhook_url, json=data)
+            "text": text,
+             "icon_emoji": ':smile:'}
+    response = http_session().post(os.environ['SLACK_WEBHOOK_URL'],
+                                   json=data, timeout=TIMEOUT)
+    response.raise_for_status()
+
+def format_event(event):
+    """Format asg event as a slack line."""
+    # using format to reference python dictionary
+    return "From {source} at {detail[StartTime]}: {detail[Description]}".format(**event)
+
+def post_to_slack(event, context):
+    """Post asg scale up event on the slack.
+
+    With SLACK_QUEUE_URL set the event is queued for post_digest instead.
+    """
+    queue_url = os.environ.get('SLACK_QUEUE_URL')
+    if queue_url:
+        sqs_client().send_message(QueueUrl=queue_url,
+                                  MessageBody=json.dumps(event))
+        return
+    send_message(format_event(event))
     return
 
+def post_digest(event, context):
+    """Post one slack message for a batch of queued asg events."""
+    groups = OrderedDict()
+    for record in event['Records']:
+        asg_event = json.loads(record['body'])
+        name = asg_event['detail'].get('AutoScalingGroupName', 'unknown')
+        groups.setdefault(name, []).append(asg_event)
+
+    lines = []
+    for name, asg_events in groups.items():
+        lines.append("*{}*: {} events".format(name, len(asg_events)))
+        lines.extend(format_event(asg_event) for asg_event in asg_events)
+    if lines:
+        # a failed post raises, so sqs delivers the batch again
+        send_message("\n".join(lines))
+    return
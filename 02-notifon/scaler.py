@@ -0,0 +1,147 @@
+# coding: utf-8
+"""Set desired capacity of auto scaling groups and wait until it is in service."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import awsclients
+import click
+
+MAX_WORKERS = 10
+# describe_auto_scaling_groups accepts at most 100 names per call
+DESCRIBE_BATCH = 100
+MIN_DELAY = 2
+MAX_DELAY = 30
+
+
+def autoscaling_client(session):
+    """Get autoscaling client sized for concurrent calls."""
+    return session.client('autoscaling', concurrency=MAX_WORKERS)
+
+
+def groups_by_tag(client, key, value=None):
+    """Get names of auto scaling groups with a tag."""
+    filters = [{'Name': 'key', 'Values': [key]}]
+    if value is not None:
+        filters.append({'Name': 'value', 'Values': [value]})
+    names = []
+    for page in client.get_paginator('describe_tags').paginate(
+            Filters=filters):
+        for tag in page['Tags']:
+            if tag['ResourceType'] == 'auto-scaling-group' and \
+                    tag['ResourceId'] not in names:
+                names.append(tag['ResourceId'])
+    return names
+
+
+def set_capacity(client, names, capacity):
+    """Set desired capacity of all groups concurrently."""
+    def set_one(name):
+        client.set_desired_capacity(
+            AutoScalingGroupName=name,
+            DesiredCapacity=capacity,
+            HonorCooldown=False
+        )
+        return name
+
+    with ThreadPoolExecutor(min(MAX_WORKERS, len(names))) as executor:
+        return list(executor.map(set_one, names))
+
+
+def describe_groups(client, names):
+    """Describe groups with as few calls as possible."""
+    groups = []
+    for start in range(0, len(names), DESCRIBE_BATCH):
+        groups.extend(client.describe_auto_scaling_groups(
+            AutoScalingGroupNames=names[start:start + DESCRIBE_BATCH],
+            MaxRecords=DESCRIBE_BATCH
+        )['AutoScalingGroups'])
+    return groups
+
+
+def in_service(group):
+    """Count healthy in service instances of a group."""
+    return sum(1 for instance in group['Instances']
+               if instance['LifecycleState'] == 'InService' and
+               instance['HealthStatus'] == 'Healthy')
+
+
+def is_ready(group):
+    """Check if group runs exactly its desired capacity."""
+    capacity = group['DesiredCapacity']
+    return in_service(group) == capacity and \
+        len(group['Instances']) == capacity
+
+
+def wait_for_capacity(client, names, timeout=900):
+    """Poll all groups until they are ready, return names still waiting.
+
+    One poll describes every waiting group, the delay between polls
+    grows while nothing changes and drops back when a group progresses.
+    """
+    waiting = list(names)
+    deadline = time.monotonic() + timeout
+    delay = MIN_DELAY
+    last = None
+    while waiting:
+        groups = describe_groups(client, waiting)
+        state = {group['AutoScalingGroupName']:
+                 (in_service(group), len(group['Instances']))
+                 for group in groups}
+        for group in groups:
+            if is_ready(group):
+                name = group['AutoScalingGroupName']
+                print("{} ready with {} instances".format(
+                    name, group['DesiredCapacity']))
+                waiting.remove(name)
+        if not waiting or time.monotonic() + delay > deadline:
+            break
+
+        delay = MIN_DELAY if state != last else min(delay * 2, MAX_DELAY)
+        last = state
+        time.sleep(delay)
+    return waiting
+
+
+def scale(session, names, capacity, wait=True, timeout=900):
+    """Scale groups to capacity, return names of groups not ready in time."""
+    client = autoscaling_client(session)
+    set_capacity(client, names, capacity)
+    print("Desired capacity of {} set to {}".format(
+        ', '.join(names), capacity))
+    if not wait:
+        return []
+    return wait_for_capacity(client, names, timeout)
+
+
+@click.command()
+@click.argument('names', nargs=-1)
+@click.option('--capacity', type=int, required=True,
+              help="Desired capacity of every group.")
+@click.option('--tag', default=None,
+              help="Select groups by tag, KEY or KEY=VALUE.")
+@click.option('--profile', default='poc', help="Use a given AWS profile.")
+@click.option('--wait/--no-wait', default=True,
+              help="Wait until capacity is in service.")
+@click.option('--timeout', default=900, help="Seconds to wait.")
+def cli(names, capacity, tag, profile, wait, timeout):
+    """Scale auto scaling groups by NAMES or tag."""
+    session = awsclients.session(profile_name=profile)
+    names = list(names)
+    if tag:
+        key, _, value = tag.partition('=')
+        for name in groups_by_tag(autoscaling_client(session), key,
+                                  value if '=' in tag else None):
+            if name not in names:
+                names.append(name)
+    if not names:
+        raise click.UsageError("No auto scaling groups selected.")
+
+    not_ready = scale(session, names, capacity, wait, timeout)
+    if not_ready:
+        raise click.ClickException("Not ready in {}s: {}".format(
+            timeout, ', '.join(not_ready)))
+
+
+if __name__ == '__main__':
+    cli()
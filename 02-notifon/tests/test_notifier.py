@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Tests for queued asg events posted as one slack digest."""
+
+import boto3
+import moto
+import pytest
+
+from notifier import handler
+
+WEBHOOK_URL = 'https://hooks.slack.test/services/kitten'
+
+
+class FakeResponse:
+    """Successful webhook response."""
+
+    @staticmethod
+    def raise_for_status():
+        """Never fail."""
+
+
+class FakeHttp:
+    """Webhook session recording the posted messages."""
+
+    def __init__(self):
+        """Create a FakeHttp without posts."""
+        self.posts = []
+
+    def post(self, url, json, timeout):
+        """Record posted slack message."""
+        self.posts.append((url, json, timeout))
+        return FakeResponse()
+
+
+def asg_event(name, description):
+    """Build EC2 instance launch event of an auto scaling group."""
+    return {
+        'source': 'aws.autoscaling',
+        'detail': {
+            'AutoScalingGroupName': name,
+            'StartTime': '2020-04-01T10:00:00Z',
+            'Description': description
+        }
+    }
+
+
+@pytest.fixture(name='queue_url')
+def fixture_queue_url(monkeypatch):
+    """URL of a moto SQS queue the handler sends events to."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.delenv('SQS_ENDPOINT_URL', raising=False)
+    with moto.mock_aws():
+        queue_url = boto3.client('sqs').create_queue(
+            QueueName='slack')['QueueUrl']
+        monkeypatch.setenv('SLACK_QUEUE_URL', queue_url)
+        monkeypatch.setattr(handler, '_SQS', None)
+        yield queue_url
+
+
+@pytest.fixture(name='http')
+def fixture_http(monkeypatch):
+    """Stubbed webhook session."""
+    http = FakeHttp()
+    monkeypatch.setenv('SLACK_WEBHOOK_URL', WEBHOOK_URL)
+    monkeypatch.setattr(handler, '_HTTP', http)
+    return http
+
+
+def receive(queue_url):
+    """Receive queued messages as an SQS lambda event."""
+    messages = boto3.client('sqs').receive_message(
+        QueueUrl=queue_url,
+        MaxNumberOfMessages=10
+    )['Messages']
+    return {'Records': [{'body': message['Body']} for message in messages]}
+
+
+def test_queued_events_posted_as_digest(queue_url, http):
+    """Events are queued, then posted once, grouped by asg."""
+    handler.post_to_slack(asg_event('web', 'Launching a'), None)
+    handler.post_to_slack(asg_event('worker', 'Launching b'), None)
+    handler.post_to_slack(asg_event('web', 'Launching c'), None)
+    assert http.posts == []
+
+    handler.post_digest(receive(queue_url), None)
+
+    assert len(http.posts) == 1
+    url, data, timeout = http.posts[0]
+    assert url == WEBHOOK_URL
+    assert timeout == handler.TIMEOUT
+    # sqs may reorder messages, group order follows the received batch
+    groups = {}
+    for line in data['text'].split('\n'):
+        if line.startswith('*'):
+            lines = groups[line] = []
+        else:
+            lines.append(line)
+    assert groups == {
+        '*web*: 2 events': [
+            'From aws.autoscaling at 2020-04-01T10:00:00Z: Launching a',
+            'From aws.autoscaling at 2020-04-01T10:00:00Z: Launching c'
+        ],
+        '*worker*: 1 events': [
+            'From aws.autoscaling at 2020-04-01T10:00:00Z: Launching b'
+        ]
+    }
+
+
+def test_empty_batch_posts_nothing(http):
+    """Digest of no events posts no message."""
+    handler.post_digest({'Records': []}, None)
+    assert http.posts == []
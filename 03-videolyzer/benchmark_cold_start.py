@@ -0,0 +1,122 @@
+"""Measure cold start of videolyzer handlers with stubbed AWS backends.
+
+Every run is a fresh python process, which imports the handler module
+and invokes start_processing_video and handle_job_completion twice:
+the first call pays for client creation, the second one reuses warm
+clients.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+
+HANDLER_DIR = Path(__file__).resolve().parent / 'videolyzer'
+AWSCLIENTS_DIR = Path(__file__).resolve().parent.parent / '00-awsclients'
+
+RUN = r'''
+import copy, json, sys, time
+start = time.perf_counter()
+import handler
+import clients
+imported = time.perf_counter()
+
+from botocore.stub import Stubber
+
+S3_EVENT = {'Records': [{'s3': {
+    'bucket': {'name': 'videos'},
+    'object': {'key': 'video.mp4', 'size': 1024, 'eTag': 'abc'}}}]}
+SNS_EVENT = {'Records': [{'Sns': {'Message': json.dumps({
+    'JobId': 'job', 'Status': 'SUCCEEDED', 'API': 'StartLabelDetection',
+    'Video': {'S3ObjectName': 'video.mp4', 'S3Bucket': 'videos'}})}}]}
+LABELS = {
+    'JobStatus': 'SUCCEEDED',
+    'VideoMetadata': {'Codec': 'h264', 'DurationMillis': 10000,
+                      'Format': 'mp4', 'FrameRate': 25.0},
+    'Labels': [{'Timestamp': t * 500, 'Label': {
+        'Name': 'Dog', 'Confidence': 97.5, 'Instances': [], 'Parents': []}}
+        for t in range(20)]
+}
+JOB_STATE = {'Attributes': {
+    'videoName': {'S': 'video.mp4'},
+    'contentKey': {'S': 'abc-1024'},
+    'jobs': {'M': {'labels': {'S': 'job'}}}}}
+
+create = clients.SESSION.create
+
+
+def stubbed_create(kind, name, *args):
+    """Create client with stubbed responses for two invocations."""
+    created = create(kind, name, *args)
+    low_level = created if kind == 'client' else created.meta.client
+    stubber = Stubber(low_level)
+    for _ in range(2):
+        if name == 'rekognition':
+            stubber.add_response('start_label_detection', {'JobId': 'job'})
+            stubber.add_response('get_label_detection', LABELS)
+        if name == 'dynamodb':
+            stubber.add_response('get_item', {})
+            stubber.add_response('put_item', {})
+            # boto3 deserializes responses in place, add fresh copies
+            stubber.add_response('update_item', copy.deepcopy(JOB_STATE))
+            stubber.add_response('query', {'Items': []})
+            stubber.add_response('batch_write_item', {'UnprocessedItems': {}})
+            stubber.add_response('put_item', {})
+    stubber.activate()
+    return created
+
+
+clients.SESSION.create = stubbed_create
+timings = {'import': imported - start}
+for run in ('first', 'warm'):
+    began = time.perf_counter()
+    handler.start_processing_video(S3_EVENT, None)
+    handler.handle_job_completion(SNS_EVENT, None)
+    timings[run] = time.perf_counter() - began
+timings['total'] = timings['import'] + timings['first']
+print(json.dumps(timings))
+'''
+
+
+@click.option('--runs', default=10, help="Number of fresh processes.")
+@click.command()
+def benchmark(runs):
+    """Print import and invocation times of the handlers."""
+    env = dict(
+        os.environ,
+        AWS_DEFAULT_REGION='eu-west-1',
+        AWS_ACCESS_KEY_ID='testing',
+        AWS_SECRET_ACCESS_KEY='testing',
+        REKOGNITION_SNS_TOPIC_ARN='arn:aws:sns:eu-west-1:000000000000:t',
+        REKOGNITION_ROLE_ARN='arn:aws:iam::000000000000:role/r',
+        DYNAMODB_TABLE_NAME='videos',
+        LABELS_TABLE_NAME='labels',
+        LABEL_INDEX_TABLE_NAME='label-index',
+        RESULT_CACHE_TABLE_NAME='result-cache',
+        JOBS_TABLE_NAME='jobs',
+        PYTHONPATH=os.pathsep.join([str(HANDLER_DIR), str(AWSCLIENTS_DIR)])
+    )
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', RUN],
+            env=env,
+            cwd=str(HANDLER_DIR),
+            stdout=subprocess.PIPE,
+            check=True
+        ).stdout
+        results.append(json.loads(output.decode('utf-8').splitlines()[-1]))
+
+    for phase in ('import', 'first', 'warm', 'total'):
+        values = [result[phase] * 1000 for result in results]
+        print("{:<7} median {:8.1f} ms  min {:8.1f} ms  max {:8.1f} ms"
+              .format(phase, statistics.median(values),
+                      min(values), max(values)))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,300 @@
+"""Replay S3 and SNS events through videolyzer handlers offline.
+
+Rekognition is replaced with a local stub that returns paginated label
+sets sized by video duration, DynamoDB is moto (in process) or
+DynamoDB Local (--endpoint-url). Reports events per second, latency
+percentiles of both stages and peak memory per video duration.
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+HANDLER_DIR = Path(__file__).resolve().parent / 'videolyzer'
+TABLES = {
+    'DYNAMODB_TABLE_NAME': 'replay-videos',
+    'LABELS_TABLE_NAME': 'replay-labels',
+    'LABEL_INDEX_TABLE_NAME': 'replay-label-index',
+    'RESULT_CACHE_TABLE_NAME': 'replay-result-cache',
+    'JOBS_TABLE_NAME': 'replay-jobs'
+}
+SAMPLE_MILLIS = 500
+
+
+class RekognitionStub:
+    """Local Rekognition video API with generated label sets.
+
+    Every started job gets labels_per_frame labels sampled every 500 ms
+    over the duration of its video, returned sorted by name.
+    """
+
+    def __init__(self, durations, labels_per_frame):
+        """Create a RekognitionStub, durations maps video key to seconds."""
+        self.durations = durations
+        self.labels_per_frame = labels_per_frame
+        self.jobs = {}
+        self.started = []
+
+    def start(self, api, **params):
+        """Start job, same token gives the same job."""
+        job_id = params.get('ClientRequestToken') or str(len(self.jobs))
+        if job_id not in self.jobs:
+            self.jobs[job_id] = (api, params)
+            self.started.append(job_id)
+        return {'JobId': job_id}
+
+    def get_label_detection(self, JobId, MaxResults=1000, NextToken=None,
+                            **_):
+        """Get page of generated labels."""
+        _, params = self.jobs[JobId]
+        key = params['Video']['S3Object']['Name']
+        frames = self.durations[key] * 1000 // SAMPLE_MILLIS
+        total = frames * self.labels_per_frame
+        offset = int(NextToken or 0)
+        labels = []
+        for index in range(offset, min(offset + MaxResults, total)):
+            name, frame = divmod(index, frames)
+            labels.append({
+                'Timestamp': frame * SAMPLE_MILLIS,
+                'Label': {
+                    'Name': 'Label{:03d}'.format(name),
+                    'Confidence': 50 + (index * 7919 % 5000) / 100,
+                    'Instances': [],
+                    'Parents': []
+                }
+            })
+        page = {
+            'JobStatus': 'SUCCEEDED',
+            'VideoMetadata': {
+                'Codec': 'h264',
+                'DurationMillis': self.durations[key] * 1000,
+                'Format': 'QuickTime / MOV',
+                'FrameRate': 25.0
+            },
+            'LabelModelVersion': '2.0',
+            'Labels': labels
+        }
+        if offset + MaxResults < total:
+            page['NextToken'] = str(offset + MaxResults)
+        return page
+
+    def __getattr__(self, name):
+        """Start jobs of any detector, other detectors find nothing."""
+        if name.startswith('start_'):
+            return lambda **params: self.start(name, **params)
+        if name.startswith('get_'):
+            return lambda **params: {
+                'JobStatus': 'SUCCEEDED',
+                'Faces': [],
+                'TextDetections': [],
+                'ModerationLabels': []
+            }
+        raise AttributeError(name)
+
+    def completion_event(self, job_id):
+        """Build SNS event Rekognition sends when the job finishes."""
+        start, params = self.jobs[job_id]
+        message = {
+            'JobId': job_id,
+            'Status': 'SUCCEEDED',
+            'API': ''.join(part.title() for part in start.split('_')),
+            'JobTag': params.get('JobTag'),
+            'Timestamp': int(time.time() * 1000),
+            'Video': {
+                'S3ObjectName': params['Video']['S3Object']['Name'],
+                'S3Bucket': params['Video']['S3Object']['Bucket']
+            }
+        }
+        return {'Records': [{'Sns': {'Message': json.dumps(message)}}]}
+
+
+def s3_event(bucket, key, number):
+    """Build synthetic S3 upload event."""
+    return {'Records': [{
+        'eventSource': 'aws:s3',
+        's3': {
+            'bucket': {'name': bucket},
+            'object': {
+                'key': key,
+                'size': 1000000 + number,
+                'eTag': '{:032x}'.format(number),
+                'sequencer': '{:016X}'.format(number)
+            }
+        }
+    }]}
+
+
+def create_tables(dynamodb):
+    """Create videolyzer tables."""
+    def create(name, keys, attributes, **extra):
+        dynamodb.create_table(
+            TableName=name,
+            KeySchema=[
+                {'AttributeName': key, 'KeyType': key_type}
+                for key, key_type in keys
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': key, 'AttributeType': key_type}
+                for key, key_type in attributes
+            ],
+            BillingMode='PAY_PER_REQUEST',
+            **extra
+        ).wait_until_exists()
+
+    create(TABLES['DYNAMODB_TABLE_NAME'], [('videoName', 'HASH')],
+           [('videoName', 'S')])
+    create(TABLES['JOBS_TABLE_NAME'], [('videoName', 'HASH')],
+           [('videoName', 'S')])
+    create(TABLES['RESULT_CACHE_TABLE_NAME'], [('contentKey', 'HASH')],
+           [('contentKey', 'S')])
+    create(TABLES['LABELS_TABLE_NAME'],
+           [('videoName', 'HASH'), ('labelKey', 'RANGE')],
+           [('videoName', 'S'), ('labelKey', 'S')])
+    create(TABLES['LABEL_INDEX_TABLE_NAME'],
+           [('labelName', 'HASH'), ('videoName', 'RANGE')],
+           [('labelName', 'S'), ('videoName', 'S'),
+            ('maxConfidence', 'N')],
+           LocalSecondaryIndexes=[{
+               'IndexName': 'byMaxConfidence',
+               'KeySchema': [
+                   {'AttributeName': 'labelName', 'KeyType': 'HASH'},
+                   {'AttributeName': 'maxConfidence', 'KeyType': 'RANGE'}
+               ],
+               'Projection': {'ProjectionType': 'ALL'}
+           }])
+
+
+def start_mock():
+    """Start moto DynamoDB mock."""
+    try:
+        from moto import mock_aws as mock
+    except ImportError:
+        from moto import mock_dynamodb as mock
+    mocked = mock()
+    mocked.start()
+    return mocked
+
+
+def percentile(values, percent):
+    """Get percentile of a list of values."""
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))),
+                len(ordered) - 1)
+    return ordered[index]
+
+
+def timed(function, *args):
+    """Run function, return seconds and peak traced memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function(*args)
+        return (time.perf_counter() - start,
+                tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+
+@click.command()
+@click.option('--durations', default='10,60,600,3600,10800',
+              help="Comma separated video durations in seconds.")
+@click.option('--videos', default=3,
+              help="Number of videos of every duration.")
+@click.option('--labels-per-frame', default=10,
+              help="Distinct labels in every sampled frame.")
+@click.option('--events', 'events_file', type=click.Path(exists=True),
+              default=None,
+              help="Replay recorded S3 events (JSON lines) instead of "
+                   "synthetic ones, every video gets the first duration.")
+@click.option('--endpoint-url', default=None,
+              help="Use DynamoDB Local at this URL instead of moto.")
+def replay(durations, videos, labels_per_frame, events_file, endpoint_url):
+    """Replay upload and completion events and report throughput."""
+    os.environ.update(TABLES)
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ['REKOGNITION_SNS_TOPIC_ARN'] = \
+        'arn:aws:sns:eu-west-1:000000000000:replay'
+    os.environ['REKOGNITION_ROLE_ARN'] = \
+        'arn:aws:iam::000000000000:role/replay'
+    if endpoint_url:
+        os.environ['DYNAMODB_ENDPOINT_URL'] = endpoint_url
+    else:
+        start_mock()
+
+    sys.path.insert(0, str(HANDLER_DIR))
+    import clients
+    import handler
+    from submission import s3_records
+
+    durations = [int(duration) for duration in durations.split(',')]
+    if events_file:
+        with open(events_file) as file:
+            events = [json.loads(line) for line in file if line.strip()]
+    else:
+        events = [
+            s3_event('replay', 'video-{}s-{}.mp4'.format(duration, number),
+                     index * videos + number)
+            for index, duration in enumerate(durations)
+            for number in range(videos)
+        ]
+    video_durations = {}
+    for event in events:
+        for _, record in s3_records(event):
+            key = record['s3']['object']['key']
+            seconds = int(key.split('-')[1][:-1]) \
+                if key.startswith('video-') else durations[0]
+            video_durations[key] = seconds
+
+    rekognition = RekognitionStub(video_durations, labels_per_frame)
+    create = clients.SESSION.create
+    clients.SESSION.create = lambda kind, name, *args: rekognition \
+        if name == 'rekognition' else create(kind, name, *args)
+    create_tables(clients.resource('dynamodb'))
+
+    stats = {}
+    began = time.perf_counter()
+    for event in events:
+        _, record = next(s3_records(event))
+        key = record['s3']['object']['key']
+        result = stats.setdefault(video_durations[key], {
+            'start': [], 'completion': [], 'memory': []
+        })
+        seconds, peak = timed(handler.start_processing_video, event, None)
+        result['start'].append(seconds)
+        result['memory'].append(peak)
+        for job_id in rekognition.started:
+            seconds, peak = timed(handler.handle_job_completion,
+                                  rekognition.completion_event(job_id), None)
+            result['completion'].append(seconds)
+            result['memory'].append(peak)
+        rekognition.started = []
+    elapsed = time.perf_counter() - began
+
+    handled = sum(len(result['start']) + len(result['completion'])
+                  for result in stats.values())
+    print("{} events in {:.2f}s, {:.1f} events/s".format(
+        handled, elapsed, handled / elapsed))
+    for duration, result in sorted(stats.items()):
+        print("{:>6}s video, {} labels:".format(
+            duration, duration * 1000 // SAMPLE_MILLIS * labels_per_frame))
+        for stage in ('start', 'completion'):
+            values = [value * 1000 for value in result[stage]]
+            if not values:
+                continue
+            print("  {:<10} p50 {:9.1f} ms  p95 {:9.1f} ms  p99 {:9.1f} ms"
+                  .format(stage, percentile(values, 50),
+                          percentile(values, 95), percentile(values, 99)))
+        if result['memory']:
+            print("  peak memory {:.1f} MB".format(
+                max(result['memory']) / 2**20))
+
+
+if __name__ == '__main__':
+    replay()
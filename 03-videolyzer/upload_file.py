@@ -1,27 +1,112 @@
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hashlib import md5
 from pathlib import Path
 
 import click
-import boto3
+import awsclients
+from boto3.s3.transfer import TransferConfig
+
+MB = 1024 * 1024
+
+
+def find_videos(sources, pattern):
+    """Yield (path, key) of files, directories and globs in sources."""
+    for source in sources:
+        for match in sorted(glob.glob(str(Path(source).expanduser()))):
+            path = Path(match).resolve()
+            if path.is_dir():
+                # keys keep the layout below the directory
+                for video in sorted(path.rglob(pattern)):
+                    if video.is_file():
+                        yield video, video.relative_to(path).as_posix()
+            elif path.is_file():
+                yield path, path.name
+
+
+def existing_etags(s3_client, bucketname):
+    """Get ETags of all objects in a bucket."""
+    etags = set()
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucketname):
+        for obj in page.get('Contents', []):
+            etags.add(obj['ETag'])
+    return etags
+
+
+def local_etag(path, part_size):
+    """Compute ETag S3 gives the file when uploaded with part_size."""
+    hashes = []
+    with open(path, 'rb') as file:
+        while True:
+            data = file.read(part_size)
+            if not data:
+                break
+            hashes.append(md5(data))
+    # transfer uses multipart from part_size up, even for a single part
+    if path.stat().st_size < part_size:
+        return '"{}"'.format((hashes[0] if hashes else md5()).hexdigest())
+    digest = md5(b''.join(part.digest() for part in hashes))
+    return '"{}-{}"'.format(digest.hexdigest(), len(hashes))
+
 
 @click.option('--profile', default='poc', help="Use a given AWS profile")
-@click.argument('pathname', type=click.Path(exists=True))
+@click.option('--pattern', default='*.mp4',
+              help="Files to upload from directories")
+@click.option('--jobs', default=4, help="Files uploaded at the same time")
+@click.option('--part-size', default=16, help="Multipart part size in MB")
+@click.option('--part-concurrency', default=8,
+              help="Parts of one file uploaded at the same time")
+@click.argument('pathnames', nargs=-1, required=True)
 @click.argument('bucketname')
 @click.command()
-def upload_file(profile, pathname, bucketname):
-    """Upload <PATHNAME> to <BUCKETNAME>"""
+def upload_file(profile, pattern, jobs, part_size, part_concurrency,
+                pathnames, bucketname):
+    """Upload videos in <PATHNAMES> (files, directories or globs) to <BUCKETNAME>
 
-    session_cfg = {}
-    if profile:
-        session_cfg['profile_name'] = profile
+    Videos with content already in the bucket are skipped, they are
+    compared by ETag computed with the same part size.
+    """
+    part_size = part_size * MB
+    session = awsclients.session(profile_name=profile or None)
+    s3_client = session.client('s3', concurrency=jobs * part_concurrency)
+    transfer_config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=part_concurrency
+    )
+    etags = existing_etags(s3_client, bucketname)
 
-    session = boto3.Session(**session_cfg)
-    s3 = session.resource('s3')
+    def upload(path, key):
+        if local_etag(path, part_size) in etags:
+            return None
+        s3_client.upload_file(str(path), bucketname, key,
+                              Config=transfer_config)
+        return path.stat().st_size
 
-    bucket = s3.Bucket(bucketname)
-    path = Path(pathname).expanduser().resolve()
+    started = time.perf_counter()
+    uploaded = skipped = total = 0
+    with ThreadPoolExecutor(jobs) as executor:
+        futures = {
+            executor.submit(upload, path, key): key
+            for path, key in find_videos(pathnames, pattern)
+        }
+        for future in as_completed(futures):
+            size = future.result()
+            if size is not None:
+                uploaded += 1
+                total += size
+                print("Uploaded {} ({:.1f} MB)".format(futures[future],
+                                                       size / MB))
+            else:
+                skipped += 1
+                print("Skipped {}, already in bucket".format(futures[future]))
 
-    bucket.upload_file(str(path), str(path.name))
+    elapsed = time.perf_counter() - started
+    print("Uploaded {} files, {:.1f} MB in {:.1f}s ({:.1f} MB/s), "
+          "skipped {}".format(uploaded, total / MB, elapsed,
+                              total / MB / elapsed, skipped))
 
 if __name__ == '__main__':
     upload_file()
-
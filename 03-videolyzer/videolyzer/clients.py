@@ -0,0 +1,37 @@
+"""Shared AWS clients, created lazily and reused by warm invocations."""
+
+import os
+
+import awsclients
+from botocore.config import Config
+
+# pool size and retries come from awsclients
+CONFIG = Config(
+    connect_timeout=5,
+    read_timeout=30
+)
+CONCURRENCY = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 25))
+# endpoint overrides, e.g. DynamoDB Local
+ENDPOINT_URLS = {
+    'dynamodb': os.environ.get('DYNAMODB_ENDPOINT_URL')
+}
+
+# caches clients per service, survives between warm invocations
+SESSION = awsclients.Session(config=CONFIG)
+
+
+def client(name):
+    """Get shared client of a service."""
+    return SESSION.client(name, concurrency=CONCURRENCY,
+                          endpoint_url=ENDPOINT_URLS.get(name))
+
+
+def resource(name):
+    """Get shared resource of a service."""
+    return SESSION.resource(name, concurrency=CONCURRENCY,
+                            endpoint_url=ENDPOINT_URLS.get(name))
+
+
+def reset():
+    """Forget all clients, next use creates new ones."""
+    SESSION.reset()
@@ -0,0 +1,85 @@
+"""Rekognition video detectors and their results in label form."""
+
+from collections import namedtuple
+
+Detector = namedtuple(
+    'Detector',
+    ['name', 'start', 'get', 'api', 'items', 'sort_by', 'to_label']
+)
+
+
+def label_to_label(item):
+    """Keep label detection as it is."""
+    return item
+
+
+def face_to_label(item):
+    """Convert face detection to label form."""
+    face = item['Face']
+    return {
+        'Timestamp': item['Timestamp'],
+        'Label': {
+            'Name': 'face:Face',
+            'Confidence': face['Confidence'],
+            'Instances': [{
+                'BoundingBox': face['BoundingBox'],
+                'Confidence': face['Confidence']
+            }],
+            'Parents': []
+        }
+    }
+
+
+def text_to_label(item):
+    """Convert text detection to label form, one label per text."""
+    text = item['TextDetection']
+    return {
+        'Timestamp': item['Timestamp'],
+        'Label': {
+            'Name': 'text:' + text['DetectedText'],
+            'Confidence': text['Confidence'],
+            'Instances': [{
+                'BoundingBox': text['Geometry']['BoundingBox'],
+                'Confidence': text['Confidence']
+            }],
+            'Parents': []
+        }
+    }
+
+
+def moderation_to_label(item):
+    """Convert content moderation label to label form."""
+    label = item['ModerationLabel']
+    parents = [label['ParentName']] if label.get('ParentName') else []
+    return {
+        'Timestamp': item['Timestamp'],
+        'Label': {
+            'Name': 'moderation:' + label['Name'],
+            'Confidence': label['Confidence'],
+            'Instances': [],
+            'Parents': [{'Name': 'moderation:' + name} for name in parents]
+        }
+    }
+
+
+DETECTORS = {
+    detector.name: detector for detector in (
+        Detector('labels', 'start_label_detection', 'get_label_detection',
+                 'StartLabelDetection', 'Labels', 'NAME', label_to_label),
+        Detector('faces', 'start_face_detection', 'get_face_detection',
+                 'StartFaceDetection', 'Faces', None, face_to_label),
+        Detector('text', 'start_text_detection', 'get_text_detection',
+                 'StartTextDetection', 'TextDetections', None,
+                 text_to_label),
+        Detector('moderation', 'start_content_moderation',
+                 'get_content_moderation', 'StartContentModeration',
+                 'ModerationLabels', 'NAME', moderation_to_label)
+    )
+}
+BY_API = {detector.api: detector for detector in DETECTORS.values()}
+
+
+def configured(names):
+    """Get detectors from comma separated names."""
+    return [DETECTORS[name.strip()] for name in names.split(',')
+            if name.strip()]
@@ -1,90 +1,287 @@
 import os
-import urllib
-import boto3
+import queue
+import threading
 import json
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+import clients
+import jobstate
+import resultcache
+from detectors import BY_API, DETECTORS, configured
+from labelstore import LabelWriter, to_decimal
+from submission import batch_response, submit_jobs
 
 
-def start_label_detection(bucket, key):
-    """Start rekognition for a given s3 key."""
-    rkg_client = boto3.client('rekognition')
-    response = rkg_client.start_label_detection(
-        Video={
+def start_detection(detector, bucket, key, token=None, job_tag=None):
+    """Start rekognition video job of a detector for a given s3 key.
+
+    The same token always gets the same job, see submission.request_token.
+    """
+    rkg_client = clients.client('rekognition')
+    params = {
+        'Video': {
             'S3Object': {
                 'Bucket': bucket,
                 'Name': key
             }
         },
-        NotificationChannel={
+        'NotificationChannel': {
             'SNSTopicArn': os.environ['REKOGNITION_SNS_TOPIC_ARN'],
             'RoleArn': os.environ['REKOGNITION_ROLE_ARN']
-        })
+        }
+    }
+    if token:
+        # every detector needs its own token
+        params['ClientRequestToken'] = sha256(
+            (token + detector.name).encode('utf-8')
+        ).hexdigest()
+    if job_tag:
+        params['JobTag'] = job_tag
+    response = getattr(rkg_client, detector.start)(**params)
 
-    return
+    return response['JobId']
+
+def jobs_table():
+    """Get job state table."""
+    dynamodb = clients.resource('dynamodb')
+    return dynamodb.Table(os.environ['JOBS_TABLE_NAME'])
+
+def result_cache():
+    """Get result cache table."""
+    dynamodb = clients.resource('dynamodb')
+    return dynamodb.Table(os.environ['RESULT_CACHE_TABLE_NAME'])
+
+def start_video_job(bucket, key, token, record):
+    """Start processing of one uploaded video.
+
+    Content analysed before under another name gets a copy of the
+    stored labels instead of a new rekognition job.
+    """
+    content_key = resultcache.content_key(record['s3']['object'])
+    cached = resultcache.lookup(result_cache(), content_key)
+    if cached == (key, bucket):
+        print("Skipping {}, labels already stored".format(key))
+        return
+    if cached:
+        print("Copying labels of {} to {}".format(cached[0], key))
+        copy_labels(cached[0], key, bucket)
+        return
+    detectors = configured(os.environ.get('VIDEOLYZER_DETECTORS', 'labels'))
+    if not detectors:
+        print("Skipping {}, no detectors configured".format(key))
+        return
+    if not jobstate.create(jobs_table(), key, bucket, token, content_key,
+                           [detector.name for detector in detectors]):
+        # redelivered or retried after a failed start, the same token
+        # returns jobs already started instead of starting new ones
+        print("Starting jobs of {} again, same request token".format(key))
+    # job tag comes back in the completion message
+    with ThreadPoolExecutor(len(detectors)) as executor:
+        list(executor.map(
+            lambda detector: start_detection(detector, bucket, key,
+                                             token, content_key),
+            detectors
+        ))
+
+def get_job_results(detector, job_id):
+    """Generate rekognition result pages of a detector job.
 
-def get_video_labels(job_id):
-    """Get rekognition labels based on job id."""
-    rkg_client = boto3.client('rekognition')
-    response = rkg_client.get_label_detection(JobId=job_id)
-    next_token = response.get('NextToken', None)
-    while next_token:
-        next_page = rkg_client.get_label_detection(
-            JobId=job_id,
-            NextToken=next_token
-        )
+    Pages are sorted by name where the API allows it and fetched only
+    when needed, so memory use doesn't grow with video length.
+    """
+    rkg_client = clients.client('rekognition')
+    params = {
+        'JobId': job_id,
+        'MaxResults': 1000
+    }
+    if detector.sort_by:
+        params['SortBy'] = detector.sort_by
+    while True:
+        response = getattr(rkg_client, detector.get)(**params)
+        yield response
         next_token = response.get('NextToken', None)
-        # extend is appending each item from the list
-        response['Labels'].extend(next_page['Labels'])
-
-
-    return response
-
-def make_item(data):
-    """Convert float to string."""
-    if isinstance(data, dict):
-        return { k: make_item(v) for k, v in data.items() }
-    if isinstance(data, list):
-        return [ make_item(v) for v in data ]
-    if isinstance(data, float):
-        return str(data)
-
-    return data
-
-def put_labels_in_db(data, video_name, video_bucket):
-    """Write state into dynamodb table."""
-    del data['ResponseMetadata']
-    del data['JobStatus']
-
-    data['videoName'] = video_name
-    data['videoBucket'] = video_bucket
-    data = make_item(data)
-    dynamodb = boto3.resource('dynamodb')
-    table_name = os.environ['DYNAMODB_TABLE_NAME']
-    videos_table = dynamodb.Table(table_name)
-    videos_table.put_item(Item=data)
+        if not next_token:
+            return
+        params['NextToken'] = next_token
+
+def prefetch(pages, size=2):
+    """Start fetching pages in a background thread right away.
+
+    Returns a generator of the pages. Fetching stops as soon as the
+    generator is closed or the caller fails while iterating, the thread
+    never stays blocked on a full buffer.
+    """
+    fetched = fetch_pages(pages, size)
+    # run up to the first yield, which starts the thread
+    next(fetched)
+    return fetched
+
+def fetch_pages(pages, size):
+    """Generate pages fetched in a background thread, None first."""
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetch():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except Exception as error:
+            put(error)
+            return
+        put(done)
+
+    threading.Thread(target=fetch, daemon=True).start()
+    try:
+        yield None
+        while True:
+            page = buffer.get()
+            if page is done:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+        # drop buffered pages, a blocked put returns at once
+        while not buffer.empty():
+            buffer.get_nowait()
+
+def put_results_in_db(results, video_name, video_bucket):
+    """Write results of all detectors into dynamodb, one record per label.
+
+    results are (detector, pages) pairs. Video item keeps video
+    metadata, labels go to the labels table and the label index table.
+    """
+    dynamodb = clients.resource('dynamodb')
+    writer = LabelWriter(
+        dynamodb,
+        os.environ['LABELS_TABLE_NAME'],
+        video_name,
+        index_table=os.environ['LABEL_INDEX_TABLE_NAME'],
+        video_bucket=video_bucket
+    )
+    # labels gone since an earlier analysis are deleted on close
+    writer.load_stored()
+    video = None
+    for detector, pages in results:
+        writer.sorted_names = detector.sort_by == 'NAME'
+        for page in pages:
+            if video is None:
+                video = {
+                    'videoName': video_name,
+                    'videoBucket': video_bucket,
+                    'VideoMetadata':
+                        to_decimal(page.get('VideoMetadata', {})),
+                    'LabelModelVersion': page.get('LabelModelVersion', '')
+                }
+            for item in page[detector.items]:
+                writer.add(detector.to_label(item))
+        # names of detectors never overlap, finish this one's labels
+        writer.finish_all()
+
+    if video is not None:
+        video['labelCount'] = writer.labels
+        writer.put(os.environ['DYNAMODB_TABLE_NAME'], video)
+    writer.close()
+    return
+
+def copy_labels(source_name, video_name, video_bucket):
+    """Store labels of an analysed video under another video name."""
+    dynamodb = clients.resource('dynamodb')
+    labels_table = dynamodb.Table(os.environ['LABELS_TABLE_NAME'])
+    videos_table_name = os.environ['DYNAMODB_TABLE_NAME']
+    writer = LabelWriter(
+        dynamodb,
+        labels_table.name,
+        video_name,
+        index_table=os.environ['LABEL_INDEX_TABLE_NAME'],
+        video_bucket=video_bucket
+    )
+    writer.load_stored()
+    params = {
+        'KeyConditionExpression': 'videoName = :name',
+        'ExpressionAttributeValues': {':name': source_name}
+    }
+    while True:
+        response = labels_table.query(**params)
+        for item in response['Items']:
+            writer.copy_item(item)
+        if 'LastEvaluatedKey' not in response:
+            break
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    video = dynamodb.Table(videos_table_name).get_item(
+        Key={'videoName': source_name}
+    ).get('Item', {})
+    video.update(videoName=video_name, videoBucket=video_bucket,
+                 labelCount=writer.labels)
+    writer.put(videos_table_name, video)
+    writer.close()
     return
 
 # Lambda events functions
 
 def start_processing_video(event, context):
-    """Rekognition of mp4 video on upload do s3."""
-    for record in event['Records']:
-        bucket = record['s3']['bucket']['name']
-        key = urllib.parse.unquote_plus(
-            record['s3']['object']['key']
-        )
-        start_label_detection(bucket, key)
+    """Rekognition of mp4 video on upload do s3.
+
+    Accepts S3 events directly or wrapped in SQS messages, in the latter
+    case only failed messages are reported back for retry.
+    """
+    failures = submit_jobs(
+        event,
+        start_video_job,
+        float(os.environ.get('REKOGNITION_START_TPS', 5))
+    )
+    return batch_response(failures)
 
 
-def handle_label_detection(event, context):
-    """Print topic event."""
+def handle_job_completion(event, context):
+    """Store results of all detectors when the last job of a video ends."""
     for record in event['Records']:
         message = json.loads(record['Sns']['Message'])
-        job_id = message['JobId']
+        detector = BY_API[message['API']]
         s3_object = message['Video']['S3ObjectName']
         s3_bucket = message['Video']['S3Bucket']
+        job_id = message['JobId']
+        if message['Status'] != 'SUCCEEDED':
+            print("{} job of {} ended with {}".format(
+                detector.name, s3_object, message['Status']))
+            job_id = None
+
+        state = jobstate.complete(jobs_table(), s3_object,
+                                  detector.name, job_id)
+        if state is None:
+            continue
 
-        response = get_video_labels(job_id)
+        if not state['jobs']:
+            print("No detector job of {} succeeded".format(s3_object))
+            continue
 
-        put_labels_in_db(response, s3_object, s3_bucket)
+        # all detectors are fetched in parallel while results are written
+        results = [
+            (DETECTORS[name],
+             prefetch(get_job_results(DETECTORS[name], finished_job)))
+            for name, finished_job in sorted(state['jobs'].items())
+        ]
+        try:
+            put_results_in_db(results, s3_object, s3_bucket)
+        finally:
+            for _, pages in results:
+                pages.close()
+        if state.get('contentKey'):
+            resultcache.remember(result_cache(), state['contentKey'],
+                                 s3_object, s3_bucket)
 
     return
+
@@ -0,0 +1,75 @@
+"""Per video state of running detector jobs."""
+
+from botocore.exceptions import ClientError
+
+
+def is_conditional_failure(error):
+    """Check if client error is a failed condition expression."""
+    code = error.response['Error']['Code']
+    return code == 'ConditionalCheckFailedException'
+
+
+def create(table, video_name, video_bucket, token, content_key, detectors):
+    """Track new jobs of a video, return False for redelivered events.
+
+    State of a redelivered event is kept as it is, jobs may have
+    completed already.
+    """
+    try:
+        table.put_item(
+            Item={
+                'videoName': video_name,
+                'videoBucket': video_bucket,
+                'requestToken': token,
+                'contentKey': content_key,
+                'pending': set(detectors),
+                'jobs': {}
+            },
+            ConditionExpression='attribute_not_exists(videoName) OR '
+                                'requestToken <> :token',
+            ExpressionAttributeValues={':token': token}
+        )
+        return True
+    except ClientError as error:
+        if not is_conditional_failure(error):
+            raise
+        return False
+
+
+def complete(table, video_name, detector, job_id):
+    """Mark job of a detector finished.
+
+    Returns the video state when it was the last pending job, None
+    otherwise, also for duplicated notifications. Failed jobs are
+    passed with job_id None and are left out of the results.
+    """
+    update = 'DELETE pending :detectors'
+    values = {
+        ':detectors': {detector},
+        ':detector': detector
+    }
+    names = {}
+    if job_id:
+        update = 'SET jobs.#detector = :job ' + update
+        values[':job'] = job_id
+        names['#detector'] = detector
+    params = {
+        'Key': {'videoName': video_name},
+        'UpdateExpression': update,
+        'ConditionExpression': 'contains(pending, :detector)',
+        'ExpressionAttributeValues': values,
+        'ReturnValues': 'ALL_NEW'
+    }
+    if names:
+        params['ExpressionAttributeNames'] = names
+    try:
+        state = table.update_item(**params)['Attributes']
+    except ClientError as error:
+        if not is_conditional_failure(error):
+            raise
+        return None
+
+    # the last element removed from a set removes the attribute
+    if state.get('pending'):
+        return None
+    return state
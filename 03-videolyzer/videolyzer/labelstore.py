@@ -0,0 +1,351 @@
+"""Compact DynamoDB storage of Rekognition labels."""
+
+import time
+from array import array
+from decimal import Decimal
+
+# stay well below 400 KB DynamoDB item size limit
+MAX_RECORD_BYTES = 300 * 1024
+# records kept in memory when names come unsorted, oldest are written
+MAX_OPEN_BYTES = 8 * 1024 * 1024
+BATCH_SIZE = 25
+MAX_RETRIES = 8
+BOX_FIELDS = ('Left', 'Top', 'Width', 'Height')
+
+
+def to_decimal(data):
+    """Convert floats to Decimal, the only number type DynamoDB accepts."""
+    if isinstance(data, dict):
+        return {k: to_decimal(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [to_decimal(v) for v in data]
+    if isinstance(data, float):
+        return Decimal(str(data))
+
+    return data
+
+
+def pack_varint(value, out):
+    """Append zigzag encoded varint to bytearray."""
+    value = (value << 1) ^ (value >> 63)
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    """Read zigzag encoded varint, return value and next position."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return (value >> 1) ^ -(value & 1), position
+
+
+def label_prefix(name):
+    """Get labelKey prefix of all records of a label.
+
+    The # separating name and chunk number is escaped in the name, so
+    a prefix never matches records of another label.
+    """
+    return name.replace('%', '%25').replace('#', '%23') + '#'
+
+
+def to_hundredths(confidence):
+    """Quantise confidence percent to 0.01."""
+    return min(int(round(confidence * 100)), 0xffff)
+
+
+class LabelRecord:
+    """Occurrences of one label in one video, packed into binary arrays.
+
+    - timestamps: delta encoded zigzag varints, milliseconds
+    - confidences: uint16, hundredths of percent
+    - instances: per occurrence varint count, then for every bounding box
+      Left, Top, Width, Height scaled to uint16 and confidence as above
+    """
+
+    def __init__(self, name, parents, chunk=0):
+        """Create an empty LabelRecord."""
+        self.name = name
+        self.parents = parents
+        self.chunk = chunk
+        self.timestamps = bytearray()
+        self.confidences = array('H')
+        self.instances = bytearray()
+        self.count = 0
+        self.last_timestamp = 0
+        self.first_timestamp = None
+        self.max_confidence = 0
+
+    def add(self, timestamp, label):
+        """Add one occurrence of the label."""
+        pack_varint(timestamp - self.last_timestamp, self.timestamps)
+        self.last_timestamp = timestamp
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.confidences.append(to_hundredths(label['Confidence']))
+        self.max_confidence = max(self.max_confidence, label['Confidence'])
+
+        instances = label.get('Instances', [])
+        pack_varint(len(instances), self.instances)
+        for instance in instances:
+            box = instance['BoundingBox']
+            values = array('H', [
+                min(int(round(box.get(field, 0) * 0xffff)), 0xffff)
+                for field in BOX_FIELDS
+            ])
+            values.append(to_hundredths(instance['Confidence']))
+            self.instances.extend(values.tobytes())
+        self.count += 1
+
+    def size(self):
+        """Estimate item size in bytes."""
+        return len(self.timestamps) + len(self.instances) + \
+            self.confidences.itemsize * len(self.confidences) + 256
+
+    def to_item(self, video_name):
+        """Convert record to DynamoDB item."""
+        return {
+            'videoName': video_name,
+            'labelKey': '{}{:04d}'.format(label_prefix(self.name),
+                                          self.chunk),
+            'labelName': self.name,
+            'parents': self.parents,
+            'occurrences': self.count,
+            'firstTimestamp': self.first_timestamp,
+            'lastTimestamp': self.last_timestamp,
+            'maxConfidence': Decimal(str(self.max_confidence)),
+            'timestamps': bytes(self.timestamps),
+            'confidences': self.confidences.tobytes(),
+            'instances': bytes(self.instances)
+        }
+
+
+def unpack_item(item):
+    """Generate label occurrences stored in a DynamoDB item."""
+    timestamps = bytes(item['timestamps'])
+    confidences = array('H')
+    confidences.frombytes(bytes(item['confidences']))
+    instances = bytes(item['instances'])
+
+    timestamp = 0
+    timestamp_position = 0
+    position = 0
+    for confidence in confidences:
+        delta, timestamp_position = read_varint(timestamps,
+                                                timestamp_position)
+        timestamp += delta
+        count, position = read_varint(instances, position)
+        boxes = []
+        for _ in range(count):
+            values = array('H')
+            values.frombytes(instances[position:position + 10])
+            position += 10
+            box = {
+                field: value / 0xffff
+                for field, value in zip(BOX_FIELDS, values)
+            }
+            boxes.append({
+                'BoundingBox': box,
+                'Confidence': values[4] / 100
+            })
+        yield {
+            'Timestamp': timestamp,
+            'Label': {
+                'Name': item['labelName'],
+                'Confidence': confidence / 100,
+                'Instances': boxes,
+                'Parents': [{'Name': name} for name in item['parents']]
+            }
+        }
+
+
+class LabelWriter:
+    """Aggregate streamed labels per name and batch write them.
+
+    With index_table set, every finished label also gets an inverted
+    index item (label -> video, max confidence, first/last timestamp).
+    Unsorted names keep records open until close, at most
+    MAX_OPEN_BYTES of them, the oldest are written as chunks before.
+    Records and index items of an earlier analysis that are not
+    written again are deleted on close, see load_stored.
+    """
+
+    def __init__(self, dynamodb, table_name, video_name, sorted_names=True,
+                 index_table=None, video_bucket=None):
+        """Create a LabelWriter object."""
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.video_name = video_name
+        self.sorted_names = sorted_names
+        self.index_table = index_table
+        self.video_bucket = video_bucket
+        self.records = {}
+        self.chunks = {}
+        self.summaries = {}
+        self.unfinished = set()
+        self.requests = []
+        self.labels = 0
+        self.open_bytes = 0
+        self.stored = {}
+        self.written = set()
+
+    def load_stored(self):
+        """Remember label records already stored for the video."""
+        table = self.dynamodb.Table(self.table_name)
+        params = {
+            'KeyConditionExpression': 'videoName = :name',
+            'ExpressionAttributeValues': {':name': self.video_name},
+            'ProjectionExpression': 'labelKey, labelName'
+        }
+        while True:
+            response = table.query(**params)
+            for item in response['Items']:
+                self.stored[item['labelKey']] = item['labelName']
+            if 'LastEvaluatedKey' not in response:
+                break
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def add(self, detection):
+        """Add one label detection from GetLabelDetection response.
+
+        Labels sorted by name complete one after another, so finished
+        records are written right away.
+        """
+        label = detection['Label']
+        name = label['Name']
+        if name not in self.records:
+            if self.sorted_names:
+                for finished in self.unfinished - {name}:
+                    self.finish(finished)
+            self.unfinished.add(name)
+            if name not in self.chunks:
+                self.labels += 1
+            parents = [parent['Name'] for parent in label.get('Parents', [])]
+            self.records[name] = LabelRecord(name, parents,
+                                             self.chunks.get(name, 0))
+
+        record = self.records[name]
+        before = record.size() if record.count else 0
+        record.add(detection['Timestamp'], label)
+        self.open_bytes += record.size() - before
+        if record.size() > MAX_RECORD_BYTES:
+            self.flush(name)
+        while self.open_bytes > MAX_OPEN_BYTES:
+            # dicts keep insertion order, first record is the oldest
+            self.flush(next(iter(self.records)))
+
+    def flush(self, name):
+        """Queue write of a label record."""
+        record = self.records.pop(name)
+        self.open_bytes -= record.size()
+        self.chunks[name] = record.chunk + 1
+        item = record.to_item(self.video_name)
+        self.written.add(item['labelKey'])
+        self.put(self.table_name, item)
+        self.summarize(item)
+
+    def summarize(self, item):
+        """Add stored record to the label summary of the index."""
+        name = item['labelName']
+        summary = self.summaries.get(name)
+        if summary is None:
+            summary = self.summaries[name] = {
+                'labelName': name,
+                'videoName': self.video_name,
+                'videoBucket': self.video_bucket,
+                'occurrences': 0,
+                'firstTimestamp': item['firstTimestamp'],
+                'maxConfidence': item['maxConfidence']
+            }
+        summary['occurrences'] += item['occurrences']
+        summary['lastTimestamp'] = item['lastTimestamp']
+        summary['firstTimestamp'] = min(summary['firstTimestamp'],
+                                        item['firstTimestamp'])
+        summary['maxConfidence'] = max(summary['maxConfidence'],
+                                       item['maxConfidence'])
+
+    def copy_item(self, item):
+        """Store a label record of another video under this video name."""
+        item = dict(item, videoName=self.video_name)
+        if item['labelName'] not in self.summaries:
+            self.labels += 1
+        self.unfinished.add(item['labelName'])
+        self.written.add(item['labelKey'])
+        self.put(self.table_name, item)
+        self.summarize(item)
+
+    def finish(self, name):
+        """Write last record of a label and its index item."""
+        if name in self.records:
+            self.flush(name)
+        self.unfinished.discard(name)
+        if self.index_table:
+            self.put(self.index_table, dict(self.summaries[name]))
+
+    def put(self, table_name, item):
+        """Queue put request, write batch when full."""
+        self.requests.append((table_name, {'PutRequest': {'Item': item}}))
+        if len(self.requests) >= BATCH_SIZE:
+            self.write_batch()
+
+    def delete(self, table_name, key):
+        """Queue delete request, write batch when full."""
+        self.requests.append((table_name, {'DeleteRequest': {'Key': key}}))
+        if len(self.requests) >= BATCH_SIZE:
+            self.write_batch()
+
+    def delete_stale(self):
+        """Delete stored records and index items not written again."""
+        for label_key in self.stored:
+            if label_key not in self.written:
+                self.delete(self.table_name, {'videoName': self.video_name,
+                                              'labelKey': label_key})
+        if self.index_table:
+            for name in set(self.stored.values()) - set(self.summaries):
+                self.delete(self.index_table, {'labelName': name,
+                                               'videoName': self.video_name})
+        self.stored = {}
+
+    def write_batch(self):
+        """Write queued requests, retrying unprocessed items with backoff."""
+        request_items = {}
+        for table_name, request in self.requests:
+            request_items.setdefault(table_name, []).append(request)
+        self.requests = []
+
+        for attempt in range(MAX_RETRIES):
+            if not request_items:
+                return
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 5))
+            response = self.dynamodb.batch_write_item(
+                RequestItems=request_items
+            )
+            request_items = response.get('UnprocessedItems', {})
+
+        raise RuntimeError(
+            'Unprocessed items left after {} retries'.format(MAX_RETRIES))
+
+    def finish_all(self):
+        """Queue writes of all remaining records and index items."""
+        for name in list(self.unfinished):
+            self.finish(name)
+
+    def close(self):
+        """Write all remaining records, then delete stale ones.
+
+        Puts are written first, a batch can't put and delete one key.
+        """
+        self.finish_all()
+        if self.requests:
+            self.write_batch()
+        self.delete_stale()
+        if self.requests:
+            self.write_batch()
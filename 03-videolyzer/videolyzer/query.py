@@ -0,0 +1,104 @@
+"""Search videos by label using the label index table."""
+
+from decimal import Decimal
+
+import click
+from boto3.dynamodb.conditions import Attr, Key
+
+import clients
+from labelstore import label_prefix, unpack_item
+
+CONFIDENCE_INDEX = 'byMaxConfidence'
+
+
+def query_all(table, **kwargs):
+    """Generate all items of a paginated query."""
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def find_videos(index_table, label, min_confidence=0, start=None, end=None):
+    """Find videos containing label, as key lookups on the index table.
+
+    Confidence is part of the key (local secondary index), time range
+    is checked on first/last timestamps of the label in the video.
+    """
+    params = {
+        'IndexName': CONFIDENCE_INDEX,
+        'KeyConditionExpression':
+            Key('labelName').eq(label) &
+            Key('maxConfidence').gte(Decimal(str(min_confidence)))
+    }
+    condition = None
+    if start is not None:
+        condition = Attr('lastTimestamp').gte(start)
+    if end is not None:
+        before_end = Attr('firstTimestamp').lte(end)
+        condition = before_end if condition is None else condition & before_end
+    if condition is not None:
+        params['FilterExpression'] = condition
+
+    return query_all(index_table, **params)
+
+
+def find_occurrences(labels_table, video_name, label, min_confidence=0,
+                     start=None, end=None):
+    """Generate occurrences of label in a video."""
+    items = query_all(
+        labels_table,
+        KeyConditionExpression=Key('videoName').eq(video_name) &
+        Key('labelKey').begins_with(label_prefix(label))
+    )
+    for item in items:
+        for occurrence in unpack_item(item):
+            timestamp = occurrence['Timestamp']
+            if occurrence['Label']['Confidence'] < min_confidence or \
+                    (start is not None and timestamp < start) or \
+                    (end is not None and timestamp > end):
+                continue
+            yield occurrence
+
+
+@click.command()
+@click.option('--min-confidence', default=0.0,
+              help="Minimal label confidence in percent.")
+@click.option('--start', type=int, default=None,
+              help="Start of time range in milliseconds.")
+@click.option('--end', type=int, default=None,
+              help="End of time range in milliseconds.")
+@click.option('--occurrences', is_flag=True,
+              help="Print timestamps of every occurrence.")
+@click.option('--endpoint-url', envvar='DYNAMODB_ENDPOINT_URL', default=None,
+              help="Use other DynamoDB endpoint, e.g. DynamoDB Local.")
+@click.option('--index-table', envvar='LABEL_INDEX_TABLE_NAME',
+              required=True, help="Label index table name.")
+@click.option('--labels-table', envvar='LABELS_TABLE_NAME',
+              required=True, help="Labels table name.")
+@click.argument('label')
+def search(min_confidence, start, end, occurrences, endpoint_url,
+           index_table, labels_table, label):
+    """Find videos with <LABEL>, and when it shows up."""
+    if endpoint_url:
+        clients.ENDPOINT_URLS['dynamodb'] = endpoint_url
+    dynamodb = clients.resource('dynamodb')
+    index = dynamodb.Table(index_table)
+    labels = dynamodb.Table(labels_table)
+
+    for video in find_videos(index, label, min_confidence, start, end):
+        print("{videoName}: max confidence {maxConfidence}, "
+              "from {firstTimestamp} ms to {lastTimestamp} ms".format(**video))
+        if occurrences:
+            for occurrence in find_occurrences(labels, video['videoName'],
+                                               label, min_confidence,
+                                               start, end):
+                print("  {} ms: {:.2f}".format(
+                    occurrence['Timestamp'],
+                    occurrence['Label']['Confidence']))
+
+
+if __name__ == '__main__':
+    search()
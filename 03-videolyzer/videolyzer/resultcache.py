@@ -0,0 +1,31 @@
+"""Results of finished videos, keyed by S3 content, to skip duplicates."""
+
+import time
+
+TTL_DAYS = 30
+
+
+def content_key(s3_object):
+    """Get cache key of S3 object from event, ETag and size.
+
+    Also used as Rekognition JobTag, so it only uses [a-zA-Z0-9_.-:].
+    """
+    return '{}-{}'.format(s3_object['eTag'].strip('"'), s3_object['size'])
+
+
+def lookup(table, key):
+    """Get cached (video name, video bucket) of content, or None."""
+    item = table.get_item(Key={'contentKey': key}).get('Item')
+    if not item or item['expiresAt'] < time.time():
+        return None
+    return item['videoName'], item['videoBucket']
+
+
+def remember(table, key, video_name, video_bucket, ttl_days=TTL_DAYS):
+    """Store video with finished results for content."""
+    table.put_item(Item={
+        'contentKey': key,
+        'videoName': video_name,
+        'videoBucket': video_bucket,
+        'expiresAt': int(time.time() + ttl_days * 86400)
+    })
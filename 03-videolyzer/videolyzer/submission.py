@@ -0,0 +1,114 @@
+"""Concurrent, rate limited and idempotent submission of video jobs."""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from urllib.parse import unquote_plus
+
+MAX_WORKERS = 10
+
+
+class RateLimiter:
+    """Spread calls evenly to stay within a transactions per second budget."""
+
+    def __init__(self, rate):
+        """Create a RateLimiter for rate calls per second."""
+        self.interval = 1.0 / rate
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call is allowed."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def request_token(bucket, key, version):
+    """Get deterministic ClientRequestToken of an S3 object version.
+
+    Redelivered events give the same token, so Rekognition returns the
+    already started job instead of starting (and billing) a new one.
+    """
+    source = '{}/{}/{}'.format(bucket, key, version)
+    return sha256(source.encode('utf-8')).hexdigest()
+
+
+def s3_records(event):
+    """Generate (SQS message id, S3 record) of direct or SQS wrapped event."""
+    for record in event['Records']:
+        if record.get('eventSource') == 'aws:sqs':
+            body = json.loads(record['body'])
+            for s3_record in body.get('Records', []):
+                yield record['messageId'], s3_record
+        else:
+            yield None, record
+
+
+def parse_record(record):
+    """Get bucket, key and version of an S3 event record."""
+    s3_object = record['s3']['object']
+    bucket = record['s3']['bucket']['name']
+    key = unquote_plus(s3_object['key'])
+    # sequencer changes with every write of a key, redelivery keeps it
+    version = s3_object.get('versionId') or s3_object.get('sequencer') or \
+        s3_object.get('eTag', '')
+    return bucket, key, version
+
+
+def submit_jobs(event, start_job, rate):
+    """Start a job for every S3 record concurrently, at most rate per second.
+
+    start_job is called with (bucket, key, token, record). Returns a
+    list of (message id, error) of failed records, message id is None
+    for records that didn't come through SQS.
+    """
+    limiter = RateLimiter(rate)
+    records = list(s3_records(event))
+
+    def submit(message_record):
+        """Start one job, return error instead of raising."""
+        message_id, record = message_record
+        # a malformed record fails alone, like a failed job start
+        location = message_id or 'S3 record'
+        try:
+            bucket, key, version = parse_record(record)
+            location = 's3://{}/{}'.format(bucket, key)
+            limiter.wait()
+            start_job(bucket, key, request_token(bucket, key, version),
+                      record)
+        except Exception as error:
+            print("Failed to start job for {}: {}".format(location, error))
+            return message_id, error
+        return None
+
+    if not records:
+        return []
+    with ThreadPoolExecutor(min(len(records), MAX_WORKERS)) as executor:
+        return [
+            failure for failure in executor.map(submit, records)
+            if failure is not None
+        ]
+
+
+def batch_response(failures):
+    """Build Lambda partial batch response from submit_jobs failures.
+
+    Direct S3 invocations can't report single records, so the whole
+    event fails and is retried, idempotency tokens keep the retry from
+    starting jobs twice.
+    """
+    direct = [error for message_id, error in failures if message_id is None]
+    if direct:
+        raise direct[0]
+    message_ids = sorted({message_id for message_id, _ in failures})
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': message_id} for message_id in message_ids
+        ]
+    }